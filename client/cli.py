@@ -1,4 +1,6 @@
 # CLI Client using Typer and Rich
+from typing import List
+
 import typer
 from rich.console import Console
 from rich.panel import Panel
@@ -18,5 +20,53 @@ def interact():
             break
         console.print(f"[italic]Echo: {user_input}[/italic]")
 
+@app.command()
+def ingest(
+    directory: str,
+    pattern: List[str] = typer.Option(["*.md", "*.txt"], "--pattern", "-p", help="File glob(s) to import"),
+    batch_size: int = typer.Option(64, help="Documents embedded per batch")
+):
+    """Bulk-import a directory of documents into Kaien memory"""
+    from modules.memory import MemoryModule
+    
+    with console.status(f"Importing {directory}..."):
+        report = MemoryModule().remember_directory(directory, patterns=pattern, batch_size=batch_size)
+    
+    console.print(
+        f"[green]Imported {report['stored']} document(s)[/green] from {report['files']} file(s) "
+        f"({report['chunked']} split into chunks) in {report['batches']} batch(es); "
+        f"skipped {report['duplicates']} duplicate(s), {report['empty']} empty"
+    )
+
+@app.command()
+def compact(
+    max_age_days: float = typer.Option(0, help="Evict documents older than this many days (0 = no limit)"),
+    max_documents: int = typer.Option(0, help="Keep at most this many documents (0 = no limit)"),
+    quota: List[str] = typer.Option([], "--quota", "-q", help="Per-source limit as source=count"),
+    summarize: bool = typer.Option(False, help="Fold evicted documents into per-source summaries"),
+    dry_run: bool = typer.Option(False, help="Only report what would be evicted")
+):
+    """Apply a retention policy to Kaien memory and report the index size"""
+    from modules.memory import MemoryModule, RetentionPolicy
+    
+    quotas = {}
+    for item in quota:
+        source, _, limit = item.partition("=")
+        if not limit.isdigit():
+            raise typer.BadParameter(f"Expected source=count, got '{item}'", param_hint="--quota")
+        quotas[source] = int(limit)
+    policy = RetentionPolicy(max_age_days, max_documents, quotas, "summarize" if summarize else "delete")
+    
+    with console.status("Compacting memory..."):
+        report = MemoryModule().compact(policy, dry_run=dry_run)
+    
+    before, after = report["before"], report["after"]
+    verb = "Would evict" if dry_run else "Evicted"
+    console.print(f"[green]{verb} {report['evicted']} document(s)[/green], wrote {report['summaries']} summary(ies)")
+    console.print(
+        f"Documents: {before['documents']} -> {after['documents']}; "
+        f"disk: {before['disk_bytes'] / 1e6:.1f} MB -> {after['disk_bytes'] / 1e6:.1f} MB"
+    )
+
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    app()
@@ -10,6 +10,7 @@ from rich.markdown import Markdown
 from litellm import completion
 import litellm
 from dotenv import load_dotenv
+from shared.agent_loop import ContextBudget, ContextBudgetError
 
 # Load Environment
 load_dotenv()
@@ -106,8 +107,11 @@ class Tools:
 
 # --- 2. The Brain (The Agent) ---
 class SeedAgent:
-    def __init__(self, model):
+    def __init__(self, model, max_steps: int = 15):
         self.model = model
+        self.max_steps = max_steps
+        # Old observations are truncated and old turns dropped so long builds stay inside the context window
+        self.budget = ContextBudget(max_tokens=32000, reserve_tokens=4000)
         self.tools = Tools()
         self.system_prompt = """You are Kaien-Seed, an autonomous construction agent.
             Your goal is to build the Kaien system by reading the 'ARCHITECTURE.md' and writing Python code.
@@ -182,10 +186,14 @@ class SeedAgent:
         self.history.append({"role": "user", "content": user_input})
 
         step_count = 0
-        max_steps = 15
 
-        while step_count < max_steps:
+        while step_count < self.max_steps:
             console.print("[dim]Thinking...[/dim]")
+            try:
+                self.history = self.budget.fit(self.history)
+            except ContextBudgetError as e:
+                console.print(f"[bold red]Context Error:[/bold red] {e}")
+                return
 
             try:
                 response = completion(
@@ -238,6 +246,8 @@ class SeedAgent:
                 break
 
             step_count += 1
+        else:
+            console.print(f"[yellow]Stopped after {self.max_steps} steps. Waiting for user...[/yellow]")
 
     # --- 3. Entry Point ---
 
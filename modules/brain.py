@@ -1,10 +1,20 @@
 import os
 import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List
 from litellm import acompletion
+from modules.llm_cache import LLMResponseCache, get_llm_cache, serialize_response, build_response
+from modules.model_router import ModelRouter
 from shared.config import Config
 
+logger = logging.getLogger(__name__)
+
+_DEFAULT_CACHE = object()
+
 class Brain:
-    def __init__(self):
+    def __init__(self, cache: LLMResponseCache = _DEFAULT_CACHE, router: ModelRouter = None):
         self.system_prompt = {
             "role": "system",
             "content": (
@@ -14,20 +24,134 @@ class Brain:
                 "3. FORMAT: Do not wrap plain text answers in JSON. Only wrap tool calls in JSON."
             )
         }
+        # Picks LLM_FAST_MODEL or LLM_SMART_MODEL per call
+        self.router = router or ModelRouter()
+        # Identical (or, with the semantic tier, near-identical) prompts skip the model
+        self.cache = get_llm_cache() if cache is _DEFAULT_CACHE else cache
 
-    async def think(self, messages: list, tools: list = None):
+    async def think(self, messages: list, tools: list = None, use_cache: bool = True, route: str = "auto"):
+        """One completion; ``route`` (see ``ModelRouter``) decides between the fast and smart model"""
         full_history = [self.system_prompt] + messages
-        print(f"DEBUG: Sending {len(full_history)} messages to model...")
+        route = self.router.resolve(route, messages)
+        model = self.router.model_for(route)
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, model, full_history, tools)
+            if cached is not None:
+                return build_response(cached)
+        logger.debug(f"Sending {len(full_history)} messages to {model} ({route})")
+        started = time.perf_counter()
         try:
             # We force tool_choice='auto' so the model can choose text OR tool
             response = await acompletion(
-                model=Config.LLM_MODEL,
+                model=model,
                 messages=full_history,
                 api_base=Config.LLM_BASE_URL,
                 tools=tools,
                 tool_choice="auto" 
             )
+            self.router.record(route, model, time.perf_counter() - started, getattr(response, "usage", None))
+            if cache is not None:
+                await asyncio.to_thread(cache.set, model, full_history, tools, serialize_response(response))
             return response
         except Exception as e:
-            print(f"CRITICAL LLM ERROR: {e}")
-            raise e
\ No newline at end of file
+            self.router.record(route, model, time.perf_counter() - started, error=True)
+            logger.error(f"LLM call to {model} ({route}) failed: {e}")
+            raise e
+
+    async def think_stream(self, messages: list, tools: list = None, use_cache: bool = True,
+                           route: str = "auto") -> AsyncIterator[Dict[str, Any]]:
+        """Like ``think`` but yields deltas as the model produces them.
+
+        Yields ``token`` events (a piece of text), ``tool_call`` events (a
+        fragment of a tool call's name or JSON arguments, keyed by
+        ``index``) and a final ``done`` event carrying the full content and
+        the assembled tool calls. A cache hit replays as one event of each.
+        """
+        full_history = [self.system_prompt] + messages
+        route = self.router.resolve(route, messages)
+        model = self.router.model_for(route)
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, model, full_history, tools)
+            if cached is not None:
+                async for event in self._replay(cached):
+                    yield event
+                return
+
+        logger.debug(f"Streaming {len(full_history)} messages to {model} ({route})")
+        started = time.perf_counter()
+        content: List[str] = []
+        calls: Dict[int, Dict[str, Any]] = {}
+        finish_reason = None
+        usage = None
+        try:
+            stream = await acompletion(
+                model=model,
+                messages=full_history,
+                api_base=Config.LLM_BASE_URL,
+                tools=tools,
+                tool_choice="auto" if tools else None,
+                stream=True
+            )
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                delta = choice.delta
+                finish_reason = choice.finish_reason or finish_reason
+                if getattr(delta, "content", None):
+                    content.append(delta.content)
+                    yield {"type": "token", "content": delta.content}
+                for call in getattr(delta, "tool_calls", None) or []:
+                    index = call.index or 0
+                    entry = calls.setdefault(index, {"id": None, "name": "", "arguments": ""})
+                    fn = call.function
+                    entry["id"] = call.id or entry["id"]
+                    entry["name"] += (fn.name or "") if fn else ""
+                    entry["arguments"] += (fn.arguments or "") if fn else ""
+                    yield {
+                        "type": "tool_call",
+                        "index": index,
+                        "id": entry["id"],
+                        "name": fn.name if fn else None,
+                        "arguments": fn.arguments if fn else None
+                    }
+        except Exception as e:
+            # Failures mid-stream count against the route just like a failed request
+            self.router.record(route, model, time.perf_counter() - started, usage, error=True)
+            logger.error(f"LLM stream from {model} ({route}) failed: {e}")
+            raise
+
+        self.router.record(route, model, time.perf_counter() - started, usage)
+        tool_calls = [calls[index] for index in sorted(calls)]
+        if cache is not None:
+            await asyncio.to_thread(cache.set, model, full_history, tools, {
+                "content": "".join(content),
+                "tool_calls": [
+                    {"id": call["id"], "type": "function",
+                     "function": {"name": call["name"], "arguments": call["arguments"]}}
+                    for call in tool_calls
+                ]
+            })
+        yield {
+            "type": "done",
+            "content": "".join(content),
+            "tool_calls": tool_calls,
+            "finish_reason": finish_reason
+        }
+
+    @staticmethod
+    async def _replay(cached: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        content = cached.get("content") or ""
+        tool_calls = [
+            {"id": call["id"], "name": call["function"]["name"], "arguments": call["function"]["arguments"]}
+            for call in cached.get("tool_calls") or []
+        ]
+        if content:
+            yield {"type": "token", "content": content, "cached": True}
+        for index, call in enumerate(tool_calls):
+            yield {"type": "tool_call", "index": index, "cached": True, **call}
+        yield {"type": "done", "content": content, "tool_calls": tool_calls,
+               "finish_reason": "stop", "cached": True}
@@ -0,0 +1,71 @@
+"""Chunker - sentence-aware splitting of long texts before they are embedded"""
+
+import re
+from typing import Iterable, Iterator, List, Union
+
+# A sentence ends at . ! or ? followed by whitespace, or at a blank line
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def _hard_split(text: str, size: int) -> Iterator[str]:
+    """Split text with no sentence breaks at the last whitespace before ``size``"""
+    while len(text) > size:
+        cut = text.rfind(" ", 0, size)
+        cut = cut if cut > size // 2 else size
+        yield text[:cut].strip()
+        text = text[cut:].strip()
+    if text:
+        yield text
+
+
+def chunk_text(text: Union[str, Iterable[str]], chunk_size: int = 1000, overlap: int = 150) -> Iterator[str]:
+    """Yield chunks of at most ``chunk_size`` characters made of whole sentences.
+
+    ``text`` may be a string or any iterable of string pieces (lines of a
+    file, network reads); only the sentences of the current chunk are held
+    in memory. Each chunk starts with the trailing sentences of the
+    previous one, up to ``overlap`` characters, so context spanning a
+    boundary is not lost. Sentences longer than ``chunk_size`` are split
+    on whitespace.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    overlap = max(0, min(overlap, chunk_size // 2))
+    pieces = [text] if isinstance(text, str) else text
+
+    current: List[str] = []
+    length = 0
+
+    def add(sentence: str) -> Iterator[str]:
+        nonlocal current, length
+        for part in _hard_split(sentence.strip(), chunk_size):
+            if current and length + len(part) + 1 > chunk_size:
+                yield " ".join(current)
+                carried: List[str] = []
+                carried_length = 0
+                for previous in reversed(current):
+                    if carried_length + len(previous) + 1 > overlap:
+                        break
+                    carried.insert(0, previous)
+                    carried_length += len(previous) + 1
+                current, length = carried, carried_length
+                while current and length + len(part) + 1 > chunk_size:
+                    length -= len(current.pop(0)) + 1
+            current.append(part)
+            length += len(part) + 1
+
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        *sentences, buffer = _SENTENCE_BREAK.split(buffer)
+        for sentence in sentences:
+            yield from add(sentence)
+        # A very long run with no sentence break is flushed rather than buffered
+        if len(buffer) > chunk_size * 2:
+            yield from add(buffer)
+            buffer = ""
+
+    if buffer.strip():
+        yield from add(buffer)
+    if current:
+        yield " ".join(current)
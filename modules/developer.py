@@ -1,5 +1,10 @@
 import os
 
+from shared import file_reader
+
+# Cap on what a single read returns to the model; larger files are paged
+MAX_READ_BYTES = 64 * 1024
+
 class DeveloperAgent:
     def list_files(self, path=""):
         if not path:
@@ -21,10 +26,25 @@ class DeveloperAgent:
         
         return "\n".join(result)
     
-    def read_file(self, path):
+    def read_file(self, path, offset=None, length=None, start_line=None, end_line=None):
+        """Read a file, a byte range, or a 1-based line range without loading the whole file"""
         try:
-            with open(path, 'r') as file:
-                return file.read()
+            if start_line is not None or end_line is not None:
+                page = file_reader.read_lines(path, start_line or 1, end_line, max_bytes=MAX_READ_BYTES)
+                if page["eof"] and page["start_line"] == 1:
+                    return page["content"]
+                if not page["lines"]:
+                    return f"[{path} has fewer than {page['start_line']} lines]"
+                more = "" if page["eof"] else f", continue with start_line={page['next_line']}"
+                return (f"[lines {page['start_line']}-{page['end_line']} of {path}{more}]\n"
+                        f"{page['content']}")
+            
+            page = file_reader.read_range(path, offset or 0, file_reader.clamp_length(length, MAX_READ_BYTES))
+            if page["offset"] == 0 and page["eof"]:
+                return page["content"]
+            more = "" if page["eof"] else f", continue with offset={page['next_offset']}"
+            return (f"[bytes {page['offset']}-{page['next_offset']} of {page['file_size']} in {path}{more}]\n"
+                    f"{page['content']}")
         except Exception as e:
             return f"Error reading file: {e}"
     
@@ -0,0 +1,280 @@
+"""HTTP Cache - content-addressed on-disk cache for scraped pages"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Hits refresh an entry's on-disk access time at most this often (seconds); LRU order is kept in memory
+ACCESS_WRITE_INTERVAL = 60
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers: Mapping[str, str], default_ttl: float, now: float = None) -> Optional[float]:
+    """Seconds a response may be served without revalidation; ``None`` means do not store it.
+
+    Follows ``Cache-Control`` (``no-store``, ``no-cache``, ``max-age``),
+    then ``Expires``, then the usual heuristic of 10% of the time since
+    ``Last-Modified``, capped at ``default_ttl``.
+    """
+    now = now or time.time()
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return float(match.group(1))
+    expires = _http_date(headers.get("Expires"))
+    if expires is not None:
+        return max(0.0, expires - now)
+    last_modified = _http_date(headers.get("Last-Modified"))
+    if last_modified is not None:
+        return min(default_ttl, max(0.0, (now - last_modified) * 0.1))
+    return default_ttl
+
+
+class CachedPage:
+    """A cache entry: validators, freshness and the converted body.
+
+    The raw HTML is read from disk only when ``html`` is first accessed
+    (or up front when no markdown was stored).
+    """
+
+    def __init__(self, url: str, meta: Dict[str, Any], markdown: Optional[str],
+                 html: Optional[str] = None, html_path: Optional[str] = None):
+        self.url = url
+        self.meta = meta
+        self.markdown = markdown
+        self._html = html
+        self._html_path = html_path
+
+    @property
+    def html(self) -> str:
+        if self._html is None:
+            with open(self._html_path, "r", encoding="utf-8") as f:
+                self._html = f.read()
+        return self._html
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.meta["expires_at"]
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this entry"""
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+
+class HTTPCache:
+    """Disk cache of scraped pages, bounded by total size.
+
+    Bodies are stored once per content hash under ``objects/``, so mirrors
+    and redirects that serve identical pages share storage; each URL has a
+    small JSON entry under ``entries/`` pointing at its body. The converted
+    markdown is stored next to the raw HTML. When the cache grows past
+    ``max_bytes`` the least recently used URLs are evicted, along with
+    bodies no other URL references.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, default_ttl: float = 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries_dir = os.path.join(directory, "entries")
+        self._objects_dir = os.path.join(directory, "objects")
+        os.makedirs(self._entries_dir, exist_ok=True)
+        os.makedirs(self._objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # url key -> metadata, least recently used first
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._object_sizes: Dict[str, int] = {}
+        self.hits = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._entries_dir, f"{key}.json")
+
+    def _object_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self._objects_dir, f"{digest}.{suffix}")
+
+    def _load(self):
+        entries = []
+        for name in os.listdir(self._entries_dir):
+            try:
+                with open(os.path.join(self._entries_dir, name), "r", encoding="utf-8") as f:
+                    entries.append((name[:-5], json.load(f)))
+            except (OSError, ValueError):
+                logger.warning(f"Dropping unreadable HTTP cache entry {name}")
+        for key, meta in sorted(entries, key=lambda item: item[1].get("accessed_at", 0)):
+            self._index[key] = meta
+        for name in os.listdir(self._objects_dir):
+            digest = name.split(".")[0]
+            self._object_sizes[digest] = self._object_sizes.get(digest, 0) + os.path.getsize(
+                os.path.join(self._objects_dir, name))
+
+    @property
+    def size(self) -> int:
+        return sum(self._object_sizes.values())
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """The cached page for ``url`` (fresh or stale), or ``None``"""
+        key = self._key(url)
+        with self._lock:
+            meta = self._index.get(key)
+            if meta is None:
+                self.misses += 1
+                return None
+            html_path = self._object_path(meta["digest"], "html")
+            try:
+                # Scraping only needs the markdown; the raw HTML is loaded only if that is missing
+                page = CachedPage(url, meta, self._read(self._object_path(meta["digest"], "md")),
+                                  html_path=html_path)
+                if page.markdown is None:
+                    page.html
+            except OSError:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._touch(key, meta, persist=time.time() - meta.get("accessed_at", 0) >= ACCESS_WRITE_INTERVAL)
+            if page.fresh:
+                self.hits += 1
+            else:
+                self.stale += 1
+            return page
+
+    def store(self, url: str, html: str, markdown: Optional[str], headers: Mapping[str, str]) -> bool:
+        """Cache a 200 response; returns False when its headers forbid storing it"""
+        lifetime = freshness_lifetime(headers, self.default_ttl)
+        if lifetime is None:
+            return False
+        digest = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        now = time.time()
+        meta = {
+            "url": url,
+            "digest": digest,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "stored_at": now,
+            "expires_at": now + lifetime
+        }
+        key = self._key(url)
+        with self._lock:
+            if digest not in self._object_sizes:
+                size = self._write(self._object_path(digest, "html"), html)
+                if markdown is not None:
+                    size += self._write(self._object_path(digest, "md"), markdown)
+                self._object_sizes[digest] = size
+            previous = self._index.pop(key, None)
+            self._touch(key, meta)
+            if previous is not None and previous["digest"] != digest:
+                self._release(previous["digest"])
+            self._evict()
+        return True
+
+    def revalidated_ok(self, page: CachedPage, headers: Mapping[str, str]):
+        """Extend a stale entry after the server answered 304 Not Modified"""
+        lifetime = freshness_lifetime(headers, self.default_ttl)
+        key = self._key(page.url)
+        with self._lock:
+            if key not in self._index:
+                return
+            meta = self._index[key]
+            meta["expires_at"] = time.time() + (lifetime or 0.0)
+            if headers.get("ETag"):
+                meta["etag"] = headers["ETag"]
+            self.revalidated += 1
+            self._touch(key, meta)
+
+    @staticmethod
+    def _read(path: str) -> Optional[str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write(path: str, text: str) -> int:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+        return os.path.getsize(path)
+
+    def _touch(self, key: str, meta: Dict[str, Any], persist: bool = True):
+        """Mark ``key`` most recently used; ``persist`` also rewrites its entry file"""
+        self._index[key] = meta
+        self._index.move_to_end(key)
+        if persist:
+            meta["accessed_at"] = time.time()
+            self._write(self._entry_path(key), json.dumps(meta))
+
+    def _drop(self, key: str):
+        meta = self._index.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+        if meta is not None:
+            self._release(meta["digest"])
+
+    def _release(self, digest: str):
+        """Delete a body once no URL refers to it"""
+        if any(meta["digest"] == digest for meta in self._index.values()):
+            return
+        for suffix in ("html", "md"):
+            try:
+                os.remove(self._object_path(digest, suffix))
+            except OSError:
+                pass
+        self._object_sizes.pop(digest, None)
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self._index) > 1:
+            key = next(iter(self._index))
+            self._drop(key)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._index),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale": self.stale,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,93 @@
+"""Lexical Index - SQLite FTS5 keyword index kept alongside the vector memory"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TERM = re.compile(r"[^\s\"]+")
+
+
+def fts_available() -> bool:
+    """True when the bundled SQLite was compiled with FTS5"""
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 MATCH expression.
+
+    Every whitespace-separated term is quoted as a phrase, so identifiers
+    such as ``10.0.0.1`` or ``config.py`` match as an exact token sequence
+    and user text can never inject FTS5 operators.
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+class LexicalIndex:
+    """BM25 keyword search over the same documents as ``kaien_knowledge``.
+
+    Rows are keyed by the document's content hash, so the index and the
+    Chroma collection can be reconciled by id. One connection is shared by
+    all threads behind a lock; FTS5 queries are fast enough that this is
+    not a bottleneck next to embedding.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts "
+            "USING fts5(doc_id UNINDEXED, source UNINDEXED, content)"
+        )
+        self.conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT count(*) FROM memory_fts").fetchone()[0]
+
+    def add(self, doc_id: str, text: str, source: str = ""):
+        self.add_many([(doc_id, text, source)])
+
+    def add_many(self, rows: Iterable[Tuple[str, str, str]]):
+        """Insert ``(doc_id, text, source)`` rows in one transaction, replacing any with the same id"""
+        rows = list(rows)
+        if not rows:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM memory_fts WHERE doc_id = ?", [(r[0],) for r in rows])
+            self.conn.executemany("INSERT INTO memory_fts (doc_id, content, source) VALUES (?, ?, ?)", rows)
+
+    def delete(self, doc_ids: Iterable[str]):
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM memory_fts WHERE doc_id = ?", [(d,) for d in doc_ids])
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, object]]:
+        """Best BM25 matches first; ``score`` is positive, higher is better"""
+        match = build_match_query(query)
+        if match is None:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT doc_id, content, bm25(memory_fts) AS rank FROM memory_fts "
+                "WHERE memory_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        return [{"id": doc_id, "document": content, "score": -rank} for doc_id, content, rank in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,250 @@
+"""LLM Cache - exact and semantic response cache in front of Brain.think"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep only the fields that affect the answer, with whitespace collapsed in text content"""
+    normalized = []
+    for message in messages:
+        entry = {"role": message.get("role")}
+        content = message.get("content")
+        entry["content"] = " ".join(content.split()) if isinstance(content, str) else content
+        for field in ("name", "tool_call_id", "tool_calls"):
+            if message.get(field) is not None:
+                entry[field] = message[field]
+        normalized.append(entry)
+    return normalized
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], tools: Optional[list]) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": normalize_messages(messages), "tools": tools or []},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def context_key(model: str, messages: List[Dict[str, Any]], tools: Optional[list]) -> str:
+    """Everything except the user turn: semantic matches must agree on model, system prompts and tools"""
+    system = [m for m in normalize_messages(messages) if m["role"] == "system"]
+    payload = json.dumps([model, system, tools or []], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def serialize_response(response: Any) -> Dict[str, Any]:
+    """The parts of a completion callers read: message content and tool calls"""
+    message = response.choices[0].message
+    tool_calls = []
+    for call in getattr(message, "tool_calls", None) or []:
+        tool_calls.append({
+            "id": call.id,
+            "type": getattr(call, "type", "function"),
+            "function": {"name": call.function.name, "arguments": call.function.arguments}
+        })
+    return {"content": message.content, "tool_calls": tool_calls}
+
+
+def build_response(data: Dict[str, Any]) -> SimpleNamespace:
+    """Rebuild a response object with the same attribute shape as a litellm completion"""
+    tool_calls = [
+        SimpleNamespace(id=call["id"], type=call["type"], function=SimpleNamespace(**call["function"]))
+        for call in data.get("tool_calls") or []
+    ] or None
+    message = SimpleNamespace(role="assistant", content=data.get("content"), tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], cached=True)
+
+
+class LLMResponseCache:
+    """Two-tier cache of model responses.
+
+    The exact tier is an SQLite table keyed on model, normalized messages
+    and tools. The optional semantic tier embeds single-turn prompts and
+    answers a new prompt with a stored response whose prompt has a cosine
+    similarity of at least ``similarity``, for the same model, system
+    prompt and tools. Embeddings are stored as packed float32 blobs and
+    only the ``semantic_candidates`` most recently used ones for that
+    context are scored, in one matrix product.
+    Entries expire after ``ttl`` seconds; past ``max_entries`` the least
+    recently used are dropped.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600, max_entries: int = 5000,
+                 embedder: Callable[[List[str]], List[List[float]]] = None, similarity: float = 0.95,
+                 semantic_candidates: int = 1000):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embedder = embedder
+        self.similarity = similarity
+        self.semantic_candidates = max(1, semantic_candidates)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                context_key TEXT NOT NULL,
+                prompt TEXT,
+                embedding BLOB,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        # Semantic candidates by recency within a context; expiry and LRU trimming on every store
+        self.conn.execute("DROP INDEX IF EXISTS idx_llm_cache_context")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_context_recent ON llm_cache(context_key, accessed_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)")
+        self.conn.commit()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def _prompt(messages: List[Dict[str, Any]]) -> Optional[str]:
+        """The prompt text for semantic matching; only single-turn requests qualify"""
+        turns = [m for m in messages if m.get("role") != "system"]
+        if len(turns) != 1 or turns[0].get("role") != "user" or not isinstance(turns[0].get("content"), str):
+            return None
+        return " ".join(turns[0]["content"].split())
+
+    def get(self, model: str, messages: List[Dict[str, Any]], tools: Optional[list] = None) -> Optional[Dict[str, Any]]:
+        """A cached serialized response, or ``None``"""
+        key = cache_key(model, messages, tools)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT response FROM llm_cache WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self.conn.commit()
+                self.exact_hits += 1
+                return json.loads(row[0])
+
+        match = self._semantic_lookup(model, messages, tools, now)
+        with self._lock:
+            if match is not None:
+                self.semantic_hits += 1
+            else:
+                self.misses += 1
+        return match
+
+    def _semantic_lookup(self, model, messages, tools, now) -> Optional[Dict[str, Any]]:
+        prompt = self._prompt(messages)
+        if self.embedder is None or prompt is None:
+            return None
+        query = self._unit(self.embedder([prompt])[0])
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT key, embedding FROM llm_cache "
+                "WHERE context_key = ? AND embedding IS NOT NULL AND created_at > ? "
+                "ORDER BY accessed_at DESC LIMIT ?",
+                (context_key(model, messages, tools), now - self.ttl, self.semantic_candidates)
+            ).fetchall()
+        rows = [(key, blob) for key, blob in rows if isinstance(blob, bytes) and len(blob) == query.nbytes]
+        if not rows:
+            return None
+        matrix = np.frombuffer(b"".join(blob for _, blob in rows), dtype=np.float32).reshape(len(rows), -1)
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        key = rows[best][0]
+        with self._lock:
+            row = self.conn.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+        return json.loads(row[0])
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector)) or 1.0
+        return vector / norm
+
+    def set(self, model: str, messages: List[Dict[str, Any]], tools: Optional[list], response: Dict[str, Any]):
+        """Store a serialized response (see ``serialize_response``)"""
+        prompt = self._prompt(messages)
+        embedding = None
+        if self.embedder is not None and prompt is not None:
+            embedding = self._unit(self.embedder([prompt])[0]).tobytes()
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key(model, messages, tools), context_key(model, messages, tools), prompt, embedding,
+                 json.dumps(response), now, now)
+            )
+            self.conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,))
+            self.conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.conn.commit()
+            self.stores += 1
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM llm_cache")
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self.conn.execute("SELECT count(*) FROM llm_cache").fetchone()[0]
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+_shared_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """The process-wide cache configured by the LLM_CACHE_* settings, or ``None`` when disabled"""
+    global _shared_cache
+    from shared.config import Config
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        embedder = None
+        if Config.LLM_CACHE_SEMANTIC:
+            from chromadb.utils import embedding_functions
+            embedder = embedding_functions.DefaultEmbeddingFunction()
+        _shared_cache = LLMResponseCache(
+            Config.LLM_CACHE_PATH,
+            ttl=Config.LLM_CACHE_TTL,
+            max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+            embedder=embedder,
+            similarity=Config.LLM_CACHE_SIMILARITY,
+            semantic_candidates=Config.LLM_CACHE_SEMANTIC_CANDIDATES
+        )
+    return _shared_cache
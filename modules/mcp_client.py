@@ -1,49 +1,97 @@
 """MCP Client - Orchestrator with LLM integration - Phase 5"""
 
 import json
+import asyncio
 import platform
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List
 
 from modules.brain import Brain
-from modules.memory import MemoryModule
-from modules.osint import OSINTModule
+from modules.memory import MemoryModule, AsyncMemory, RetentionPolicy, RECALL_MODES
+from modules.osint_jobs import OSINTScheduler
 from modules.research import ResearchAgent
 from modules.developer import DeveloperAgent
 from modules.tools_schema import SYSTEM_TOOLS
+from shared.agent_loop import AgentLoop, ContextBudget, CHARS_PER_TOKEN
+from shared.cache import LRUCache
+from shared.config import Config
+from shared.tool_registry import ToolRegistry, ToolNotFoundError, ToolArgumentError, ToolDisabledError
 
 logger = logging.getLogger(__name__)
 
 class MCPClient:
     """Orchestrator that routes queries to LLM and executes tools"""
     
-    def __init__(self):
-        """Initialize MCP client with brain and modules"""
+    def __init__(self, osint_jobs: OSINTScheduler = None, sessions: Any = None):
+        """Initialize MCP client with brain and modules.
+        
+        The API passes its own ``osint_jobs`` scheduler and a ``sessions``
+        store (``get``/``set``, sync or async) backed by its session cache;
+        standalone clients keep agent history in a local LRU cache.
+        """
         self.brain = Brain()
-        self.memory = MemoryModule()
-        self.osint = OSINTModule()
+        self.memory = AsyncMemory(MemoryModule())
+        self.osint_jobs = osint_jobs or OSINTScheduler()
+        self.osint = self.osint_jobs.osint
         self.researcher = ResearchAgent()
         self.dev = DeveloperAgent()
+        self.tools = self._build_registry()
+        # Per-session conversation history for the agent loop
+        self.sessions = sessions if sessions is not None else LRUCache(
+            max_size=Config.AGENT_MAX_SESSIONS, ttl=Config.AGENT_SESSION_TTL)
+        self.budget = ContextBudget(
+            max_tokens=Config.AGENT_CONTEXT_TOKENS,
+            reserve_tokens=Config.AGENT_REPLY_RESERVE,
+            observation_chars=Config.AGENT_OBSERVATION_CHARS
+        )
         logger.info("MCP Client Loaded with Memory, OSINT, Research, and Developer")
     
+    def _build_registry(self) -> ToolRegistry:
+        """Bind each LLM tool in SYSTEM_TOOLS to its handler"""
+        handlers = {
+            "system_info": self._system_info,
+            "remember_info": self._remember_info,
+            "recall_info": self._recall_info,
+            "run_osint_command": self._run_osint_command,
+            "run_osint_sweep": self._run_osint_sweep,
+            "osint_job_status": self._osint_job_status,
+            "deep_research": self._deep_research,
+            "read_codebase": self._read_codebase,
+            "propose_code_change": self._propose_code_change,
+        }
+        registry = ToolRegistry()
+        for tool in SYSTEM_TOOLS:
+            fn = tool["function"]
+            registry.register(
+                fn["name"],
+                handlers[fn["name"]],
+                description=fn["description"],
+                parameters=fn["parameters"],
+                unpack=False
+            )
+        return registry
+    
     # --- Tool Implementations ---
     def _system_info(self, args: Dict[str, Any] = None) -> str:
         """Get system information"""
         return f"System: {platform.system()} {platform.release()}"
     
-    def _remember_info(self, args: Dict[str, Any]) -> str:
+    async def _remember_info(self, args: Dict[str, Any]) -> str:
         """Store information in memory"""
         text = args.get("text", "")
         if not text:
             return "Error: No text provided to remember"
-        return self.memory.remember(text)
+        return await self.memory.remember(text)
     
-    def _recall_info(self, args: Dict[str, Any]) -> str:
+    async def _recall_info(self, args: Dict[str, Any]) -> str:
         """Recall information from memory"""
         query = args.get("query", "")
         if not query:
             return "Error: No query provided for recall"
-        return self.memory.recall(query)
+        mode = args.get("mode", "hybrid")
+        if mode not in RECALL_MODES:
+            return f"Error: Unknown recall mode '{mode}'"
+        return await self.memory.recall(query, mode=mode)
     
     async def _run_osint_command(self, args: Dict[str, Any]) -> str:
         """Execute OSINT command"""
@@ -52,6 +100,27 @@ class MCPClient:
             return "Error: No command provided for OSINT"
         return await self.osint.run_command(command)
     
+    async def _run_osint_sweep(self, args: Dict[str, Any]) -> str:
+        """Start a background OSINT sweep"""
+        try:
+            job = self.osint_jobs.submit(args.get("commands", []))
+        except ValueError as e:
+            return f"Error: {str(e)}"
+        return f"Started OSINT sweep {job.id} with {len(job.commands)} commands. Check it with osint_job_status."
+    
+    async def _osint_job_status(self, args: Dict[str, Any]) -> str:
+        """Report progress and finished results of an OSINT sweep"""
+        job = self.osint_jobs.get(args.get("job_id", ""))
+        if job is None:
+            return f"Error: Unknown OSINT job '{args.get('job_id', '')}'"
+        
+        snapshot = job.snapshot()
+        lines = [f"Job {job.id}: {snapshot['status']} ({snapshot['completed']}/{snapshot['total']} done)"]
+        for result in snapshot["results"]:
+            cached = " (cached)" if result.get("cached") else ""
+            lines.append(f"$ {result['command']}{cached}\n{result['output']}")
+        return "\n\n".join(lines)
+    
     async def _deep_research(self, args: Dict[str, Any]) -> str:
         """Perform deep research on a topic"""
         topic = args.get("topic", "")
@@ -69,7 +138,13 @@ class MCPClient:
         elif action == "read":
             if not path:
                 return "Error: No file path provided"
-            return self.dev.read_file(path)
+            return self.dev.read_file(
+                path,
+                offset=args.get("offset"),
+                length=args.get("length"),
+                start_line=args.get("start_line"),
+                end_line=args.get("end_line")
+            )
         else:
             return "Error: Invalid action. Use 'list' or 'read'"
     
@@ -84,67 +159,157 @@ class MCPClient:
         # Return a specific format for approval
         return f"[APPROVAL_REQUIRED] I propose updating {file_path}. Please confirm."
     
-    async def process_query(self, query: str) -> str:
+    def stats(self) -> Dict[str, Any]:
+        """Per-route model usage, LLM cache, memory and scraper counters"""
+        return {
+            "llm_routes": self.brain.router.stats(),
+            "research_llm_routes": self.researcher.brain.router.stats(),
+            "llm_cache": self.brain.cache.stats() if self.brain.cache else None,
+            "memory": self.memory.stats(),
+            "research": self.researcher.stats()
+        }
+    
+    async def close(self):
+        """Release the scraper's HTTP session, the OSINT shells and memory background work"""
+        await self.researcher.close()
+        await self.osint.close()
+        self.memory.shutdown()
+    
+    def _start_background_jobs(self):
+        """Start memory compaction once a loop is running, if retention is configured"""
+        policy = RetentionPolicy.from_config()
+        if Config.MEMORY_COMPACT_INTERVAL > 0 and not policy.empty:
+            self.memory.start_compaction(policy, Config.MEMORY_COMPACT_INTERVAL)
+    
+    def _agent_loop(self, stream: bool = False) -> AgentLoop:
+        return AgentLoop(
+            think=self._think_stream if stream else self._think_once,
+            execute=self._run_tool_calls,
+            budget=self.budget,
+            max_steps=Config.AGENT_MAX_STEPS,
+            store=self.sessions,
+            summarize=self._summarize_turns,
+            interrupt=self._approval_interrupt
+        )
+    
+    async def _think_once(self, messages: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """One non-streaming completion, reported as the agent loop's ``done`` event"""
+        response = await self.brain.think(messages, tools=SYSTEM_TOOLS)
+        message = response.choices[0].message
+        tool_calls = getattr(message, 'tool_calls', None) or []
+        if tool_calls:
+            logger.debug(f"DEBUG: Model requested tools: {len(tool_calls)}")
+        yield {
+            "type": "done",
+            "content": message.content or "",
+            "tool_calls": [
+                {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+                for call in tool_calls
+            ]
+        }
+    
+    def _think_stream(self, messages: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        return self.brain.think_stream(messages, tools=SYSTEM_TOOLS)
+    
+    async def _summarize_turns(self, messages: List[Dict[str, Any]]) -> str:
+        """Condense old turns (and tool observations) into a short note for the context window"""
+        lines = []
+        for message in messages:
+            text = message.get("content") or json.dumps(message.get("tool_calls") or "")
+            lines.append(f"{message['role']}: {text}")
+        transcript = "\n".join(lines)[-self.budget.limit * CHARS_PER_TOKEN:]
+        response = await self.brain.think(
+            [{"role": "user", "content": (
+                "Summarize this earlier part of our conversation in a few sentences. Keep facts, "
+                "identifiers, file names and tool results that may matter later.\n\n" + transcript
+            )}],
+            tools=None,
+            route="summarize"
+        )
+        return response.choices[0].message.content or ""
+    
+    async def process_query(self, query: str, session_id: str = None) -> str:
         """
         Process query through LLM and execute tools if requested.
         
         Phase 5 Logic:
-        1. Send query to LLM with tool definitions
-        2. If LLM requests tool execution, execute it
-        3. Otherwise return LLM response directly
+        1. Send query (plus the session's history, if any) to LLM with tool definitions
+        2. If LLM requests tools, execute all of them concurrently and
+           feed the results back, repeating up to AGENT_MAX_STEPS times
+        3. Return the model's final answer
+        
+        Without ``session_id`` every query starts a fresh conversation.
         """
         if not query or not isinstance(query, str):
             return "Error: Invalid query"
         
+        self._start_background_jobs()
         try:
-            # 1. Create a FRESH message list (Stateless)
-            messages = [{"role": "user", "content": query}]
-            
-            # 2. Ask the Brain
             logger.debug(f"Processing Query: {query}")
-            response = await self.brain.think(messages, tools=SYSTEM_TOOLS)
-            
-            # 3. Parse Response
-            message = response.choices[0].message
-            content = message.content or ""
-            tool_calls = getattr(message, 'tool_calls', None)
-            
-            # 4. Handle Tool Call
-            if tool_calls:
-                logger.debug(f"DEBUG: Model requested tools: {len(tool_calls)}")
-                tool_call = tool_calls[0]  # Handle first tool only for now
-                fn_name = tool_call.function.name
-                
-                try:
-                    args = json.loads(tool_call.function.arguments)
-                    logger.debug(f"DEBUG: Tool Call -> {fn_name} {args}")
-                    
-                    if fn_name == "system_info":
-                        return f"System: {self._system_info()}"
-                    elif fn_name == "remember_info":
-                        return self._remember_info(args)
-                    elif fn_name == "recall_info":
-                        return self._recall_info(args)
-                    elif fn_name == "run_osint_command":
-                        return await self._run_osint_command(args)
-                    elif fn_name == "deep_research":
-                        return await self._deep_research(args)
-                    elif fn_name == "read_codebase":
-                        return self._read_codebase(args)
-                    elif fn_name == "propose_code_change":
-                        return self._propose_code_change(args)
-                    else:
-                        return f"Error: Unknown tool '{fn_name}'"
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON decode error in tool arguments: {str(e)}")
-                    return f"Error: Invalid tool arguments - {str(e)}"
-                except Exception as e:
-                    logger.error(f"Tool execution error: {str(e)}")
-                    return f"Error: Tool execution failed - {str(e)}"
-            
-            # 5. Handle Text Response
-            return content if content else "[No Response]"
+            return await self._agent_loop().run(query, session_id)
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            return f"Error: {str(e)}"
+    
+    async def _run_tool_calls(self, calls: List[Dict[str, Any]]) -> List[str]:
+        """Execute every requested tool concurrently, at most MAX_PARALLEL_TOOL_CALLS at a time"""
+        slots = asyncio.Semaphore(max(1, Config.MAX_PARALLEL_TOOL_CALLS))
+        
+        async def run(call: Dict[str, Any]) -> str:
+            async with slots:
+                return str(await self._execute_tool_call(call["name"], call["arguments"]))
+        
+        return await asyncio.gather(*(run(call) for call in calls))
+    
+    def _approval_interrupt(self, calls: List[Dict[str, Any]], results: List[str]):
+        """Approval requests go straight back to the user instead of through the model"""
+        if any(result.startswith("[APPROVAL_REQUIRED]") for result in results):
+            return self._join_results(calls, results)
+        return None
+    
+    @staticmethod
+    def _join_results(calls: List[Dict[str, Any]], results: List[str]) -> str:
+        if len(results) == 1:
+            return results[0]
+        return "\n\n".join(f"[{call['name']}]\n{result}" for call, result in zip(calls, results))
+    
+    async def _execute_tool_call(self, fn_name: str, arguments: str) -> str:
+        """Decode a tool call's JSON arguments and dispatch it, turning failures into error strings"""
+        try:
+            args = json.loads(arguments) if arguments else {}
+            logger.debug(f"DEBUG: Tool Call -> {fn_name} {args}")
             
+            return await self.tools.dispatch(fn_name, args)
+        except ToolNotFoundError:
+            return f"Error: Unknown tool '{fn_name}'"
+        except ToolDisabledError:
+            return f"Error: Tool '{fn_name}' is disabled"
+        except ToolArgumentError as e:
+            return f"Error: Invalid tool arguments - {str(e)}"
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error in tool arguments: {str(e)}")
+            return f"Error: Invalid tool arguments - {str(e)}"
+        except Exception as e:
+            logger.error(f"Tool execution error: {str(e)}")
+            return f"Error: Tool execution failed - {str(e)}"
+    
+    async def process_query_stream(self, query: str, session_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_query.
+        
+        Forwards the model's ``token`` and ``tool_call`` deltas as they
+        arrive and one ``tool_result`` event per tool (each tagged with its
+        ``step``), and always ends with a ``final`` event holding the same
+        text process_query returns.
+        """
+        if not query or not isinstance(query, str):
+            yield {"type": "final", "content": "Error: Invalid query"}
+            return
+        
+        self._start_background_jobs()
+        try:
+            async for event in self._agent_loop(stream=True).run_stream(query, session_id):
+                yield event
         except Exception as e:
             logger.error(f"Error processing query: {str(e)}")
-            return f"Error: {str(e)}"
\ No newline at end of file
+            yield {"type": "final", "content": f"Error: {str(e)}"}
@@ -1,29 +1,550 @@
-import uuid
+import os
+import re
 import time
+import asyncio
+import fnmatch
+import hashlib
+import logging
+import functools
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
 import chromadb
+from chromadb.utils import embedding_functions
+
+from shared.cache import LRUCache
+from shared.config import Config
+from shared.metrics import LatencyStats
+from modules.lexical_index import LexicalIndex, fts_available
+from modules.chunker import chunk_text
+
+logger = logging.getLogger(__name__)
+
+RECALL_MODES = ("hybrid", "vector", "lexical")
+# Reciprocal-rank-fusion constant; larger values flatten the gap between ranks
+RRF_K = 60
+# Each retriever contributes this many candidates per requested result
+HYBRID_CANDIDATES = 4
+# Single-term queries that look like IPs, hosts, paths or file names
+_IDENTIFIER = re.compile(r"^\S*[\d./_:-]\S*$")
+
+
+def normalize_query(query: str) -> str:
+    """Collapse case and whitespace so near-identical recalls share cache entries"""
+    return " ".join(query.lower().split())
+
+
+def content_hash(text: str) -> str:
+    """Stable id for a document, so the same text is only ever stored once"""
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+def extractive_summary(source: str, documents: List[str], max_chars: int = 2000) -> str:
+    """Fold documents into one note built from the first line of each"""
+    lines = [f"Summary of {len(documents)} archived '{source}' memories:"]
+    used = len(lines[0])
+    for document in documents:
+        first = document.strip().splitlines()[0] if document.strip() else ""
+        line = f"- {first[:200]}"
+        if used + len(line) > max_chars:
+            lines.append(f"- ... and {len(documents) - len(lines) + 1} more")
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
+
+
+class RetentionPolicy:
+    """Limits enforced by ``MemoryModule.compact``.
+
+    Documents older than ``max_age_days`` are evicted first, then the
+    oldest documents of any source over its quota, then the oldest overall
+    until at most ``max_documents`` remain. ``action`` is ``delete``, or
+    ``summarize`` to fold each source's evicted documents into one summary
+    document before deleting them; room for those summaries is reserved
+    within ``max_documents``. Summaries (``summary:<source>``) never age
+    out and are never summarized again; each keeps its newest
+    ``summary_quota`` documents unless ``source_quotas`` names it.
+    """
+
+    ACTIONS = ("delete", "summarize")
+    SUMMARY_PREFIX = "summary:"
+
+    def __init__(self, max_age_days: float = None, max_documents: int = None,
+                 source_quotas: Dict[str, int] = None, action: str = "delete",
+                 summary_quota: int = 10):
+        if action not in self.ACTIONS:
+            raise ValueError(f"Unknown retention action: {action}")
+        self.max_age_days = max_age_days or None
+        self.max_documents = max_documents or None
+        self.source_quotas = dict(source_quotas or {})
+        self.action = action
+        self.summary_quota = summary_quota or None
+
+    @classmethod
+    def is_summary(cls, source: str) -> bool:
+        return source.startswith(cls.SUMMARY_PREFIX)
+
+    def quota_for(self, source: str) -> Optional[int]:
+        if source in self.source_quotas:
+            return self.source_quotas[source]
+        return self.summary_quota if self.is_summary(source) else None
+
+    @classmethod
+    def from_config(cls) -> "RetentionPolicy":
+        quotas = {}
+        for item in Config.MEMORY_SOURCE_QUOTAS.split(","):
+            if "=" in item:
+                source, limit = item.split("=", 1)
+                quotas[source.strip()] = int(limit)
+        return cls(
+            max_age_days=Config.MEMORY_MAX_AGE_DAYS,
+            max_documents=Config.MEMORY_MAX_DOCUMENTS,
+            source_quotas=quotas,
+            action=Config.MEMORY_RETENTION_ACTION,
+            summary_quota=Config.MEMORY_SUMMARY_QUOTA
+        )
+
+    @property
+    def empty(self) -> bool:
+        return not (self.max_age_days or self.max_documents or self.source_quotas)
+
 
 class MemoryModule:
-    def __init__(self):
+    def __init__(self, path: str = "./data/kaien_db", batch_size: int = 64,
+                 cache_size: int = 256, result_ttl: float = 300, lexical: bool = True,
+                 chunk_size: int = None, chunk_overlap: int = None):
         # Connect to local ChromaDB
-        self.client = chromadb.PersistentClient(path="./data/kaien_db")
-        self.collection = self.client.get_or_create_collection("kaien_knowledge")
+        self.path = path
+        self.client = chromadb.PersistentClient(path=path)
+        # Held explicitly so bulk imports can embed a whole batch in one call
+        self.embedder = embedding_functions.DefaultEmbeddingFunction()
+        self.collection = self.client.get_or_create_collection(
+            "kaien_knowledge",
+            embedding_function=self.embedder
+        )
+        self.batch_size = batch_size
+        # Longer texts are stored as overlapping sentence-aligned chunks
+        self.chunk_size = chunk_size or Config.MEMORY_CHUNK_SIZE
+        self.chunk_overlap = Config.MEMORY_CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        # Query embeddings stay valid forever; recall results only until the next write
+        self.query_embeddings = LRUCache(max_size=cache_size)
+        self.recall_cache = LRUCache(max_size=cache_size, ttl=result_ttl)
+        # Bumped by every write; a recall only caches its answer if no write happened meanwhile
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+
+        # Keyword index for exact identifiers that embeddings blur together
+        self.lexical: Optional[LexicalIndex] = None
+        if lexical and fts_available():
+            self.lexical = LexicalIndex(os.path.join(path, "lexical_fts.db"))
+            if self.lexical.count() == 0 and self.collection.count() > 0:
+                self.rebuild_lexical_index()
+        elif lexical:
+            logger.warning("SQLite was built without FTS5; recall falls back to vector search only")
+
+    def split(self, text: str, extra: Dict[str, Any] = None) -> List[tuple]:
+        """``(doc_id, text, metadata)`` items for one input: itself, or its chunks linked to the parent.
 
-    def remember(self, text: str):
+        Chunk ids are ``<parent_hash>:<chunk_index>``; each chunk's metadata
+        carries ``parent_hash`` (the hash of the whole input) and
+        ``chunk_id`` separately from its own ``content_hash``.
+        """
+        extra = extra or {}
+        doc_id = content_hash(text)
+        if len(text) <= self.chunk_size:
+            return [(doc_id, text, extra)]
+        chunks = list(chunk_text(text, self.chunk_size, self.chunk_overlap))
+        return [
+            (f"{doc_id}:{index}", chunk,
+             {**extra, "parent_hash": doc_id, "chunk_id": f"{doc_id}:{index}",
+              "chunk_index": index, "chunk_count": len(chunks)})
+            for index, chunk in enumerate(chunks)
+        ]
+
+    def remember(self, text: str, source: str = "manual"):
         """Stores text in the vector database."""
-        doc_id = str(uuid.uuid4())
-        self.collection.add(
-            documents=[text],
-            metadatas=[{"timestamp": time.time()}],
-            ids=[doc_id]
-        )
+        doc_id = content_hash(text)
+        items = self.split(text)
+        report = {"stored": 0, "duplicates": 0, "batches": 0}
+        for start in range(0, len(items), self.batch_size):
+            self._add_batch(items[start:start + self.batch_size], source, report)
+        if not report["stored"]:
+            return f"Already in memory (ID: {doc_id})"
+        if len(items) > 1:
+            return f"Stored in memory as {len(items)} chunks (ID: {doc_id})"
         return f"Stored in memory (ID: {doc_id})"
 
-    def recall(self, query: str, n_results: int = 2):
-        """Retrieves relevant context."""
+    def remember_many(self, texts: Iterable[str], source: str = "bulk",
+                      metadatas: Iterable[Dict[str, Any]] = None, batch_size: int = None) -> Dict[str, int]:
+        """Store many documents, embedding and writing them a batch at a time.
+
+        ``texts`` may be any iterable (including a generator), so large
+        imports are never held in memory at once. Long texts are chunked,
+        and ``stored`` counts chunks. Documents whose content is already
+        stored, or repeated within the input, are skipped.
+        """
+        batch_size = batch_size or self.batch_size
+        report = {"stored": 0, "duplicates": 0, "empty": 0, "chunked": 0, "batches": 0}
+        seen = set()
+        batch: List[tuple] = []
+        metadatas = iter(metadatas) if metadatas is not None else None
+
+        for text in texts:
+            extra = next(metadatas, None) if metadatas is not None else None
+            if not text or not text.strip():
+                report["empty"] += 1
+                continue
+            doc_id = content_hash(text)
+            if doc_id in seen:
+                report["duplicates"] += 1
+                continue
+            seen.add(doc_id)
+            items = self.split(text, extra)
+            if len(items) > 1:
+                report["chunked"] += 1
+            batch.extend(items)
+            while len(batch) >= batch_size:
+                self._add_batch(batch[:batch_size], source, report)
+                batch = batch[batch_size:]
+
+        if batch:
+            self._add_batch(batch, source, report)
+        return report
+
+    def _add_batch(self, batch: List[tuple], source: str, report: Dict[str, int]):
+        existing = set(self.collection.get(ids=[doc_id for doc_id, _, _ in batch])["ids"])
+        fresh = [item for item in batch if item[0] not in existing]
+        report["duplicates"] += len(batch) - len(fresh)
+        if not fresh:
+            return
+
+        now = time.time()
+        ids = [doc_id for doc_id, _, _ in fresh]
+        documents = [text for _, text, _ in fresh]
+        metadatas = [
+            {"timestamp": now, "source": source, **extra, "content_hash": content_hash(text)}
+            for _, text, extra in fresh
+        ]
+        embeddings = self.embedder(documents)
+        self.collection.add(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+        if self.lexical:
+            self.lexical.add_many(zip(ids, documents, [m["source"] for m in metadatas]))
+        self._invalidate()
+        report["stored"] += len(fresh)
+        report["batches"] += 1
+
+    def remember_directory(self, directory: str, patterns: Iterable[str] = ("*.md", "*.txt"),
+                           batch_size: int = None) -> Dict[str, int]:
+        """Import every file under ``directory`` matching ``patterns`` (one document per file)"""
+        paths = list(self._iter_files(directory, list(patterns)))
+
+        def read_all() -> Iterator[str]:
+            for path in paths:
+                try:
+                    with open(path, "r", encoding="utf-8", errors="replace") as f:
+                        yield f.read()
+                except OSError as e:
+                    logger.warning(f"Skipping {path}: {e}")
+                    yield ""
+
+        report = self.remember_many(
+            read_all(),
+            source="import",
+            metadatas=({"path": path} for path in paths),
+            batch_size=batch_size
+        )
+        report["files"] = len(paths)
+        return report
+
+    @staticmethod
+    def _iter_files(directory: str, patterns: List[str]) -> Iterator[str]:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in sorted(files):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                    yield os.path.join(root, name)
+
+    def rebuild_lexical_index(self, batch_size: int = 500) -> int:
+        """Re-index every stored document into the FTS table; returns the number indexed"""
+        if not self.lexical:
+            return 0
+        indexed = 0
+        offset = 0
+        while True:
+            page = self.collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            sources = [(m or {}).get("source", "") for m in page["metadatas"]]
+            self.lexical.add_many(zip(page["ids"], page["documents"], sources))
+            indexed += len(page["ids"])
+            offset += batch_size
+        logger.info(f"Rebuilt lexical index with {indexed} documents")
+        return indexed
+
+    def embed_query(self, query: str):
+        """Embedding for a query, reusing earlier embeddings of the same normalized text"""
+        key = normalize_query(query)
+        embedding = self.query_embeddings.get(key)
+        if embedding is None:
+            embedding = self.embedder([query])[0]
+            self.query_embeddings.set(key, embedding)
+        return embedding
+
+    def recall(self, query: str, n_results: int = 2, mode: str = "hybrid"):
+        """Retrieves relevant context.
+
+        ``mode`` is ``hybrid`` (BM25 and vector results fused), ``vector`` or
+        ``lexical``; without an FTS index every mode uses vector search.
+        """
+        if mode not in RECALL_MODES:
+            raise ValueError(f"Unknown recall mode: {mode}")
+        key = (normalize_query(query), n_results, mode)
+        cached = self.recall_cache.get(key)
+        if cached is not None:
+            return cached
+        generation = self._generation
+
+        if self.lexical is None or mode == "vector":
+            hits = self._vector_search(query, n_results)
+        elif mode == "lexical":
+            hits = self.lexical.search(query, n_results)
+        else:
+            hits = self._hybrid_search(query, n_results)
+
+        if not hits:
+            answer = "No relevant memories found."
+        else:
+            # Overlapping chunks of near-identical parents can repeat verbatim
+            answer = "\n".join(dict.fromkeys(hit["document"] for hit in hits))
+        with self._generation_lock:
+            if generation == self._generation:
+                self.recall_cache.set(key, answer)
+        return answer
+
+    def _invalidate(self):
+        """Drop cached recall answers after a write"""
+        with self._generation_lock:
+            self._generation += 1
+            self.recall_cache.clear()
+
+    def _vector_search(self, query: str, limit: int) -> List[Dict[str, Any]]:
         results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
+            query_embeddings=[self.embed_query(query)],
+            n_results=limit,
+            include=["documents", "distances"]
         )
-        if not results['documents'][0]:
-            return "No relevant memories found."
-        return "\n".join(results['documents'][0])
\ No newline at end of file
+        return [
+            {"id": doc_id, "document": document, "score": -distance}
+            for doc_id, document, distance in zip(results["ids"][0], results["documents"][0], results["distances"][0])
+        ]
+
+    def _hybrid_search(self, query: str, n_results: int) -> List[Dict[str, Any]]:
+        """Fuse BM25 and vector rankings with reciprocal rank fusion.
+
+        A lone identifier-like term (IP, hostname, file name) that already
+        has enough exact matches skips embedding entirely.
+        """
+        limit = n_results * HYBRID_CANDIDATES
+        lexical_hits = self.lexical.search(query, limit)
+        if _IDENTIFIER.match(query.strip()) and len(lexical_hits) >= n_results:
+            return lexical_hits[:n_results]
+
+        fused: Dict[str, Dict[str, Any]] = {}
+        for hits in (lexical_hits, self._vector_search(query, limit)):
+            for rank, hit in enumerate(hits):
+                entry = fused.setdefault(hit["id"], {"id": hit["id"], "document": hit["document"], "score": 0.0})
+                entry["score"] += 1.0 / (RRF_K + rank + 1)
+        return sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)[:n_results]
+
+    def index_stats(self) -> Dict[str, Any]:
+        """Document counts and the on-disk size of the memory directory"""
+        disk_bytes = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    disk_bytes += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return {
+            "documents": self.collection.count(),
+            "lexical_documents": self.lexical.count() if self.lexical else None,
+            "disk_bytes": disk_bytes
+        }
+
+    def _iter_metadata(self, batch_size: int = 500) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        offset = 0
+        while True:
+            page = self.collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+            if not page["ids"]:
+                return
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                yield doc_id, metadata or {}
+            offset += batch_size
+
+    def select_evictions(self, policy: RetentionPolicy, now: float = None) -> List[Tuple[str, str]]:
+        """``(doc_id, source)`` of every document ``policy`` would remove"""
+        now = now or time.time()
+        cutoff = now - policy.max_age_days * 86400 if policy.max_age_days else None
+        entries = sorted(
+            ((meta.get("timestamp", 0.0), doc_id, meta.get("source", "")) for doc_id, meta in self._iter_metadata()),
+            reverse=True
+        )
+
+        evicted, kept = [], []
+        per_source: Dict[str, int] = defaultdict(int)
+        for timestamp, doc_id, source in entries:
+            quota = policy.quota_for(source)
+            aged = cutoff is not None and timestamp < cutoff and not policy.is_summary(source)
+            if aged or (quota is not None and per_source[source] >= quota):
+                evicted.append((doc_id, source))
+                continue
+            per_source[source] += 1
+            kept.append((doc_id, source))
+
+        # Each source losing documents gains a summary, which has to fit as well
+        folded = set()
+        if policy.action == "summarize":
+            folded = {source for _, source in evicted if not policy.is_summary(source)}
+        while policy.max_documents and kept and len(kept) + len(folded) > policy.max_documents:
+            doc_id, source = kept.pop()
+            evicted.append((doc_id, source))
+            if policy.action == "summarize" and not policy.is_summary(source):
+                folded.add(source)
+        return evicted
+
+    def delete(self, doc_ids: List[str]):
+        """Remove documents from the collection and the lexical index"""
+        for start in range(0, len(doc_ids), self.batch_size):
+            chunk = doc_ids[start:start + self.batch_size]
+            self.collection.delete(ids=chunk)
+            if self.lexical:
+                self.lexical.delete(chunk)
+        self._invalidate()
+
+    def compact(self, policy: RetentionPolicy = None, dry_run: bool = False,
+                summarizer: Callable[[str, List[str]], str] = extractive_summary) -> Dict[str, Any]:
+        """Apply ``policy`` (the configured one by default) and report index size before and after"""
+        policy = policy or RetentionPolicy.from_config()
+        before = self.index_stats()
+        evictions = self.select_evictions(policy)
+        report = {"evicted": len(evictions), "summaries": 0, "dry_run": dry_run, "before": before}
+        if dry_run or not evictions:
+            report["after"] = before
+            return report
+
+        if policy.action == "summarize":
+            by_source: Dict[str, List[str]] = defaultdict(list)
+            for doc_id, source in evictions:
+                if not policy.is_summary(source):
+                    by_source[source].append(doc_id)
+            written = {"stored": 0, "duplicates": 0, "batches": 0}
+            for source, doc_ids in by_source.items():
+                documents = []
+                for start in range(0, len(doc_ids), self.batch_size):
+                    documents.extend(self.collection.get(ids=doc_ids[start:start + self.batch_size])["documents"])
+                # Stored whole rather than chunked, so each summary is the one document reserved for it
+                summary = summarizer(source, documents)
+                self._add_batch([(content_hash(summary), summary, {})], policy.SUMMARY_PREFIX + source, written)
+            report["summaries"] = written["stored"]
+
+        self.delete([doc_id for doc_id, _ in evictions])
+        report["after"] = self.index_stats()
+        logger.info(
+            f"Memory compaction evicted {len(evictions)} documents "
+            f"({before['documents']} -> {report['after']['documents']})"
+        )
+        return report
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit rates for the query-embedding and recall-result caches"""
+        return {
+            "embeddings": self.query_embeddings.stats(),
+            "results": self.recall_cache.stats()
+        }
+
+
+class AsyncMemory:
+    """Async facade over MemoryModule.
+
+    Embedding and HNSW search run on a dedicated thread pool so they never
+    block the event loop. Recalls run concurrently; writes are serialized
+    with a lock because they invalidate the recall cache and update the
+    index.
+    """
+
+    def __init__(self, memory: MemoryModule = None, max_workers: int = 4):
+        self.memory = memory or MemoryModule()
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kaien-memory")
+        self._write_lock = threading.Lock()
+        self._pending = 0
+        self._compaction: Optional[asyncio.Task] = None
+        self.last_compaction: Optional[Dict[str, Any]] = None
+        self.metrics = {
+            "remember": LatencyStats(),
+            "remember_many": LatencyStats(),
+            "recall": LatencyStats(),
+            "compact": LatencyStats()
+        }
+
+    def _locked(self, fn, *args, **kwargs):
+        with self._write_lock:
+            return fn(*args, **kwargs)
+
+    async def _run(self, name: str, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        try:
+            with self.metrics[name].time():
+                return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self._pending -= 1
+
+    async def remember(self, text: str, source: str = "manual") -> str:
+        return await self._run("remember", self._locked, self.memory.remember, text, source=source)
+
+    async def remember_many(self, texts: Iterable[str], **kwargs) -> Dict[str, int]:
+        return await self._run("remember_many", self._locked, self.memory.remember_many, texts, **kwargs)
+
+    async def recall(self, query: str, n_results: int = 2, mode: str = "hybrid") -> str:
+        return await self._run("recall", self.memory.recall, query, n_results, mode)
+
+    async def compact(self, policy: RetentionPolicy = None, dry_run: bool = False) -> Dict[str, Any]:
+        report = await self._run("compact", self._locked, self.memory.compact, policy, dry_run=dry_run)
+        self.last_compaction = report
+        return report
+
+    def start_compaction(self, policy: RetentionPolicy = None, interval: float = 3600):
+        """Run ``compact`` every ``interval`` seconds in the background (no-op if already running)"""
+        if self._compaction is None or self._compaction.done():
+            self._compaction = asyncio.get_running_loop().create_task(self._compaction_loop(policy, interval))
+
+    def stop_compaction(self):
+        if self._compaction is not None:
+            self._compaction.cancel()
+            self._compaction = None
+
+    async def _compaction_loop(self, policy: Optional[RetentionPolicy], interval: float):
+        while True:
+            try:
+                await self.compact(policy)
+            except Exception as e:
+                logger.error(f"Memory compaction failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth (calls submitted but not finished), per-operation latency and cache hit rates"""
+        return {
+            "queue_depth": self._pending,
+            "workers": self.max_workers,
+            "operations": {name: stats.snapshot() for name, stats in self.metrics.items()},
+            "cache": self.memory.cache_stats(),
+            "last_compaction": self.last_compaction
+        }
+
+    def shutdown(self):
+        self.stop_compaction()
+        self.executor.shutdown(wait=True)
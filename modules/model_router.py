@@ -0,0 +1,71 @@
+"""Model Router - pick the fast or smart model per call and track what each route costs"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from shared.config import Config
+from shared.metrics import LatencyStats
+
+# Which tier each kind of call uses; "auto" is decided per request
+ROUTES = {
+    "classify": "fast",
+    "plan": "fast",
+    "summarize": "fast",
+    "tools": "fast",
+    "synthesize": "smart",
+    "code": "smart",
+    "chat": "smart"
+}
+
+_CODE_HINTS = re.compile(
+    r"```|\b(def|class|import|function|refactor|implement|bug|stack ?trace|traceback|code)\b",
+    re.IGNORECASE
+)
+
+
+class ModelRouter:
+    """Sends each Brain call to the fast or smart model by route (see ``ROUTES``) and records per-route cost"""
+
+    def __init__(self, fast_model: str = None, smart_model: str = None,
+                 routes: Dict[str, str] = None, fast_max_chars: int = None):
+        self.models = {
+            "fast": fast_model or Config.LLM_FAST_MODEL,
+            "smart": smart_model or Config.LLM_SMART_MODEL
+        }
+        self.routes = {**ROUTES, **(routes or {})}
+        self.fast_max_chars = fast_max_chars or Config.LLM_ROUTER_FAST_MAX_CHARS
+        self._latency: Dict[str, LatencyStats] = {}
+        self._usage: Dict[str, Dict[str, int]] = {}
+
+    def resolve(self, route: str, messages: List[Dict[str, Any]] = None) -> str:
+        """The concrete route for a request (``auto`` becomes ``tools`` or ``code``/``chat``)"""
+        if route != "auto":
+            return route if route in self.routes else "chat"
+        user_text = " ".join(
+            m["content"] for m in messages or [] if m.get("role") != "system" and isinstance(m.get("content"), str)
+        )
+        if _CODE_HINTS.search(user_text):
+            return "code"
+        return "tools" if len(user_text) <= self.fast_max_chars else "chat"
+
+    def model_for(self, route: str) -> str:
+        return self.models[self.routes[route]]
+
+    def record(self, route: str, model: str, seconds: float, usage: Any = None, error: bool = False):
+        """Account one model call; ``usage`` is the completion's usage object or dict"""
+        self._latency.setdefault(route, LatencyStats()).record(seconds, error)
+        totals = self._usage.setdefault(route, {"prompt_tokens": 0, "completion_tokens": 0})
+        totals["model"] = model
+        if usage is not None:
+            get = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+            totals["prompt_tokens"] += get("prompt_tokens") or 0
+            totals["completion_tokens"] += get("completion_tokens") or 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": dict(self.models),
+            "routes": {
+                route: {**self._usage[route], **self._latency[route].snapshot()}
+                for route in self._usage
+            }
+        }
@@ -3,19 +3,120 @@
 import subprocess
 import asyncio
 import logging
+import re
+from typing import Any, Dict
+
+from shared.cache import LRUCache
+from shared.shell_pool import ShellPool, ShellWorkerDied
 
 logger = logging.getLogger(__name__)
 
+# Seconds an answer stays fresh per command; 0 means never cache (e.g. ping measures liveness)
+DEFAULT_CACHE_TTLS = {
+    "whois": 3600,
+    "nslookup": 300,
+    "curl": 60,
+    "nmap": 600,
+    "ping": 0,
+    "ls": 0,
+    "grep": 0
+}
+
+_HOSTNAME = re.compile(r"^[A-Za-z0-9-]+(\.[A-Za-z0-9-]+)+\.?$")
+
 class OSINTModule:
     """OSINT operations with strict timeout enforcement"""
     
-    def __init__(self):
+    def __init__(self, pool_size: int = 8, cache_size: int = 512, cache_ttls: Dict[str, int] = None):
         # Define allowed commands for OSINT operations
         self.allowed_commands = ["ping", "curl", "whois", "nslookup", "nmap", "ls", "grep"]
         self.timeout_seconds = 15  # Strict timeout for all commands
+        # Reused shells, so quick lookups don't pay a /bin/sh spawn each time
+        self.shell_pool = ShellPool(max_workers=pool_size, idle_timeout=300)
+        # Idempotent lookups are answered from cache instead of hitting resolvers again
+        self.cache_ttls = {**DEFAULT_CACHE_TTLS, **(cache_ttls or {})}
+        self.cache = LRUCache(max_size=cache_size)
+        # normalized command -> {"task": the shared execution, "waiters": callers awaiting it}
+        self._inflight: Dict[str, Dict[str, Any]] = {}
         logger.info("OSINT Module initialized with allowed commands: %s", self.allowed_commands)
     
+    @staticmethod
+    def normalize_command(command: str) -> str:
+        """Cache key for a command: collapsed whitespace, bare command name, lowercased hostnames"""
+        parts = command.strip().split()
+        if not parts:
+            return ""
+        args = [p.lower().rstrip(".") if _HOSTNAME.match(p) else p for p in parts[1:]]
+        return " ".join([parts[0].split("/")[-1]] + args)
+    
+    async def close(self):
+        """Stop the pooled shell workers"""
+        await self.shell_pool.close()
+    
+    def _ttl_for(self, key: str) -> int:
+        return self.cache_ttls.get(key.split(" ", 1)[0], 0)
+    
+    async def lookup(self, command: str) -> Dict[str, Any]:
+        """Run a command through the result cache.
+        
+        Returns the output plus ``cached`` and ``age_seconds``. Identical
+        commands already in flight share a single execution, which runs as
+        its own task: a caller that is cancelled just stops waiting, and
+        the command is only cancelled once nobody is waiting for it.
+        """
+        key = self.normalize_command(command) if isinstance(command, str) else ""
+        ttl = self._ttl_for(key) if key else 0
+        
+        if ttl:
+            entry = self.cache.get_entry(key)
+            if entry is not None:
+                output, age = entry
+                return {"command": command, "output": output, "cached": True, "age_seconds": round(age, 1)}
+            
+            flight = self._inflight.get(key)
+            shared = flight is not None
+            if not shared:
+                task = asyncio.get_running_loop().create_task(self._execute_and_cache(key, command, ttl))
+                flight = self._inflight[key] = {"task": task, "waiters": 0}
+                task.add_done_callback(lambda done: self._landed(key, flight))
+            
+            flight["waiters"] += 1
+            try:
+                output = await asyncio.shield(flight["task"])
+            finally:
+                flight["waiters"] -= 1
+                if flight["waiters"] == 0 and not flight["task"].done():
+                    flight["task"].cancel()
+            if shared:
+                return {"command": command, "output": output, "cached": True, "age_seconds": 0.0}
+        else:
+            output = await self._execute(command)
+        
+        return {"command": command, "output": output, "cached": False, "age_seconds": 0.0}
+    
+    async def _execute_and_cache(self, key: str, command: str, ttl: int) -> str:
+        output = await self._execute(command)
+        # Failures are not worth remembering
+        if not output.startswith(("Error", "Execution failed")):
+            self.cache.set(key, output, ttl=ttl)
+        return output
+    
+    def _landed(self, key: str, flight: Dict[str, Any]):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        task = flight["task"]
+        if not task.cancelled():
+            # Mark the error as retrieved even when every waiter has gone
+            task.exception()
+    
     async def run_command(self, command: str):
+        """Execute an OSINT command, answering repeated lookups from cache"""
+        result = await self.lookup(command)
+        if result["cached"]:
+            return f"[cached result, {result['age_seconds']}s old]\n{result['output']}"
+        return result["output"]
+    
+    async def _execute(self, command: str):
         """
         Executes a shell command asynchronously with strict timeout.
         
@@ -40,25 +141,19 @@ class OSINTModule:
         try:
             logger.info(f"Executing OSINT command: {command}")
             
-            # Execute command
-            proc = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            # Wait for completion with strict timeout
+            # Execute command on a pooled shell worker with strict timeout
             try:
-                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=self.timeout_seconds)
+                result = await self.shell_pool.run(command, timeout=self.timeout_seconds)
             except asyncio.TimeoutError:
-                proc.kill()
-                await proc.wait()
                 logger.warning(f"Command timed out: {command}")
                 return f"Error: Command timed out (limit {self.timeout_seconds}s)."
+            except ShellWorkerDied as e:
+                logger.warning(f"Shell worker died running {command}: {str(e)}")
+                return f"Execution failed: {str(e)}"
             
             # Process output
-            output = stdout.decode().strip() if stdout else ""
-            error = stderr.decode().strip() if stderr else ""
+            output = result["stdout"].strip()
+            error = result["stderr"].strip()
             
             if error:
                 logger.warning(f"Command error: {error}")
@@ -0,0 +1,170 @@
+"""OSINT Job Scheduler - batched, concurrency-limited OSINT sweeps"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from modules.osint import OSINTModule
+
+logger = logging.getLogger(__name__)
+
+# Heavier tools get fewer concurrent slots than quick lookups
+DEFAULT_COMMAND_LIMITS = {"nmap": 2, "curl": 4, "ping": 8, "whois": 4, "nslookup": 8}
+
+
+class OSINTJob:
+    """A batch of OSINT commands and the results collected so far"""
+
+    def __init__(self, commands: List[str]):
+        self.id = uuid.uuid4().hex[:12]
+        self.commands = commands
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.results: List[Optional[Dict[str, Any]]] = [None] * len(commands)
+        self._completed: List[Dict[str, Any]] = []
+        self._changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "cancelled")
+
+    async def _record(self, result: Dict[str, Any]):
+        async with self._changed:
+            self.results[result["index"]] = result
+            self._completed.append(result)
+            self._changed.notify_all()
+
+    async def _finish(self, status: str):
+        async with self._changed:
+            self.status = status
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": len(self.commands),
+            "completed": len(self._completed),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summary plus every finished result, in submission order"""
+        return {**self.summary(), "results": [r for r in self.results if r is not None]}
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield each result as it completes, then a final summary"""
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self._completed) > sent or self.done)
+                batch = self._completed[sent:]
+                finished = self.done
+            for result in batch:
+                yield {"type": "result", "job_id": self.id, **result}
+            sent += len(batch)
+            if finished and sent >= len(self._completed):
+                yield {"type": "done", **self.summary()}
+                return
+
+
+class OSINTScheduler:
+    """Runs OSINT batches in the background under global and per-command limits.
+
+    ``submit`` returns a job immediately; results are polled with ``get``
+    or streamed with ``OSINTJob.events``. Only the newest ``max_jobs``
+    finished jobs are kept.
+    """
+
+    def __init__(self, osint: OSINTModule = None, max_concurrency: int = 8,
+                 command_limits: Dict[str, int] = None, default_command_limit: int = 4,
+                 max_batch: int = 256, max_jobs: int = 100):
+        self.osint = osint or OSINTModule()
+        self.max_concurrency = max(1, max_concurrency)
+        self.command_limits = {**DEFAULT_COMMAND_LIMITS, **(command_limits or {})}
+        self.default_command_limit = default_command_limit
+        self.max_batch = max_batch
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, OSINTJob]" = OrderedDict()
+        self._global: Optional[asyncio.Semaphore] = None
+        self._per_command: Dict[str, asyncio.Semaphore] = {}
+
+    def _command_slot(self, command: str) -> asyncio.Semaphore:
+        parts = command.strip().split()
+        base = parts[0].split("/")[-1] if parts else ""
+        if base not in self._per_command:
+            self._per_command[base] = asyncio.Semaphore(self.command_limits.get(base, self.default_command_limit))
+        return self._per_command[base]
+
+    def submit(self, commands: List[str]) -> OSINTJob:
+        """Queue a batch of commands and start it in the background"""
+        commands = [c for c in (commands or []) if isinstance(c, str) and c.strip()]
+        if not commands:
+            raise ValueError("No commands provided")
+        if len(commands) > self.max_batch:
+            raise ValueError(f"Batch too large ({len(commands)} > {self.max_batch} commands)")
+
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+
+        job = OSINTJob(commands)
+        self._jobs[job.id] = job
+        self._prune()
+        job.task = asyncio.get_running_loop().create_task(self._run_job(job))
+        logger.info(f"Submitted OSINT job {job.id} with {len(commands)} commands")
+        return job
+
+    def get(self, job_id: str) -> Optional[OSINTJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.done or job.task is None:
+            return False
+        job.task.cancel()
+        return True
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        while len(self._jobs) > self.max_jobs and finished:
+            del self._jobs[finished.pop(0)]
+
+    async def _run_job(self, job: OSINTJob):
+        job.status = "running"
+        try:
+            await asyncio.gather(*(self._run_one(job, i, cmd) for i, cmd in enumerate(job.commands)))
+            await job._finish("completed")
+        except asyncio.CancelledError:
+            await job._finish("cancelled")
+        except Exception as e:
+            logger.error(f"OSINT job {job.id} failed: {str(e)}")
+            await job._finish("completed")
+
+    async def _run_one(self, job: OSINTJob, index: int, command: str):
+        # Per-command slot first, so commands queued behind their own limit don't hold global slots
+        async with self._command_slot(command), self._global:
+            started = time.perf_counter()
+            result = await self.osint.lookup(command)
+            elapsed = time.perf_counter() - started
+        await job._record({
+            "index": index,
+            "command": command,
+            "output": result["output"],
+            "cached": result["cached"],
+            "duration_ms": round(elapsed * 1000, 1)
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self._jobs),
+            "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+            "max_concurrency": self.max_concurrency,
+            "cache": self.osint.cache.stats()
+        }
@@ -1,22 +1,109 @@
 """Deep Research Agent - Autonomous web research capability"""
 
 import json
+import time
 import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
 import aiohttp
 from bs4 import BeautifulSoup
 import html2text
 
 from modules.brain import Brain
+from modules.http_cache import HTTPCache
 from shared.config import Config
+from shared.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+BODY_READ_SIZE = 64 * 1024
+
+
+def html_to_markdown(html: str) -> Tuple[str, float]:
+    """Convert HTML to markdown; returns the markdown and the CPU seconds it took (runs in a worker process)"""
+    started = time.process_time()
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    markdown = h.handle(html)
+    return markdown, time.process_time() - started
+
+
+def _parser_context():
+    """Start parser workers fresh (not forked) so they never inherit the server's threads and locks"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
 
 class ResearchAgent:
-    """Autonomous research agent that plans, searches, scrapes, and synthesizes"""
+    """Autonomous research agent that plans, searches, scrapes, and synthesizes
+    
+    All scrapes share one pooled HTTP session (keep-alive, DNS cache and
+    TLS reuse), created on first use and released with ``close``. Pages
+    are cached on disk; a fresh hit skips both the network and the
+    markdown conversion, and a stale one is revalidated conditionally.
+    Conversion runs in a process pool so large pages never stall the
+    event loop.
+    """
     
-    def __init__(self):
+    def __init__(self, cache: HTTPCache = None):
         """Initialize research agent with brain and configuration"""
         self.brain = Brain()
         self.config = Config()
         self.user_agent = "Kaien/1.0 Research Agent"
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._parser: Optional[ProcessPoolExecutor] = None
+        self.metrics = {"parse": LatencyStats(), "convert": LatencyStats(), "fetch": LatencyStats()}
+        self.truncated_pages = 0
+        self.parser_restarts = 0
+        self.cache = cache or HTTPCache(
+            self.config.RESEARCH_CACHE_DIR,
+            max_bytes=self.config.RESEARCH_CACHE_MAX_MB * 1024 * 1024,
+            default_ttl=self.config.RESEARCH_CACHE_TTL
+        )
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Shared session for the running loop, recreated if closed or bound to another loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.RESEARCH_MAX_CONCURRENCY,
+                limit_per_host=self.config.RESEARCH_PER_HOST_LIMIT,
+                ttl_dns_cache=300
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.config.RESEARCH_TOTAL_TIMEOUT,
+                connect=self.config.RESEARCH_CONNECT_TIMEOUT,
+                sock_read=self.config.RESEARCH_READ_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                headers={"User-Agent": self.user_agent}
+            )
+            self._semaphore = asyncio.Semaphore(self.config.RESEARCH_MAX_CONCURRENCY)
+            self._loop = loop
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session and the parser processes"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._parser is not None:
+            self._parser.shutdown(wait=False, cancel_futures=True)
+            self._parser = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.close()
         
     async def scrape(self, url: str) -> str:
         """
@@ -24,84 +111,240 @@ class ResearchAgent:
         Limits output to 2000 characters to avoid context overflow.
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = {"User-Agent": self.user_agent}
-                async with session.get(url, headers=headers, timeout=10) as response:
+            cached = await asyncio.to_thread(self.cache.get, url)
+            if cached is not None and cached.fresh and cached.markdown is not None:
+                return cached.markdown[:2000]
+            
+            session = await self._get_session()
+            headers = cached.validators() if cached is not None else {}
+            async with self._semaphore:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304 and cached is not None:
+                        await asyncio.to_thread(self.cache.revalidated_ok, cached, response.headers)
+                        markdown = cached.markdown if cached.markdown is not None else await self._to_markdown(cached.html)
+                        return markdown[:2000]
                     if response.status == 200:
-                        html = await response.text()
-                        # Convert HTML to markdown
-                        h = html2text.HTML2Text()
-                        h.ignore_links = False
-                        markdown = h.handle(html)
+                        with self.metrics["fetch"].time():
+                            html = await self._read_body(response)
+                        markdown = await self._to_markdown(html)
+                        await asyncio.to_thread(self.cache.store, url, html, markdown, response.headers)
                         # Limit to 2000 characters
                         return markdown[:2000]
                     return f"Error: HTTP {response.status}"
+        except asyncio.TimeoutError:
+            logger.warning(f"Scrape timed out: {url}")
+            return "Scrape error: timed out"
         except Exception as e:
             return f"Scrape error: {str(e)}"
     
+    async def _read_body(self, response: aiohttp.ClientResponse) -> str:
+        """Read the body in chunks, stopping once RESEARCH_MAX_HTML_BYTES have arrived"""
+        limit = self.config.RESEARCH_MAX_HTML_BYTES
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(BODY_READ_SIZE):
+            body.extend(chunk)
+            if len(body) >= limit:
+                del body[limit:]
+                self.truncated_pages += 1
+                logger.info(f"Truncated {response.url} at {limit} bytes")
+                break
+        return body.decode(response.charset or "utf-8", errors="replace")
+    
+    async def _to_markdown(self, html: str) -> str:
+        """Convert HTML to markdown in the parser pool, recording parse time.
+        
+        If a worker crashed and broke the pool, this page is converted on a
+        thread instead and a new pool is started on the next call.
+        """
+        if self._parser is None:
+            self._parser = ProcessPoolExecutor(
+                max_workers=self.config.RESEARCH_PARSE_WORKERS, mp_context=_parser_context())
+        parser = self._parser
+        html = html[:self.config.RESEARCH_MAX_HTML_BYTES]
+        loop = asyncio.get_running_loop()
+        with self.metrics["convert"].time():
+            try:
+                markdown, cpu_seconds = await loop.run_in_executor(parser, html_to_markdown, html)
+            except BrokenProcessPool:
+                logger.warning("HTML parser pool broke; converting in a thread and restarting the pool")
+                if self._parser is parser:
+                    self._parser = None
+                    self.parser_restarts += 1
+                    parser.shutdown(wait=False, cancel_futures=True)
+                markdown, cpu_seconds = await asyncio.to_thread(html_to_markdown, html)
+        self.metrics["parse"].record(cpu_seconds)
+        return markdown
+    
+    def stats(self) -> Dict[str, Any]:
+        """Fetch/convert latency (convert includes pool queueing, parse is worker CPU time) and cache stats"""
+        return {
+            **{name: stats.snapshot() for name, stats in self.metrics.items()},
+            "truncated_pages": self.truncated_pages,
+            "parser_restarts": self.parser_restarts,
+            "cache": self.cache.stats()
+        }
+    
+    async def plan(self, topic: str) -> List[str]:
+        """Step 1: Plan - Generate specific search queries"""
+        plan_prompt = (
+            f"Generate 3 specific, focused search queries for researching the topic: '{topic}'. "
+            "Return ONLY a JSON array of strings like ['query1', 'query2', 'query3']"
+        )
+        
+        plan_messages = [
+            {"role": "system", "content": "You are a research planner. Generate specific search queries."},
+            {"role": "user", "content": plan_prompt}
+        ]
+        
+        plan_response = await self.brain.think(plan_messages, tools=None, route="plan")
+        return json.loads(plan_response.choices[0].message.content)
+    
+    def search(self, queries: List[str]) -> List[str]:
+        """Step 2: Search - URLs to scrape for the planned queries"""
+        # Note: For Phase 4, we'll use a simple web search approach
+        # In production, consider using DuckDuckGoSearchRun or similar
+        urls = []
+        for query in queries[:self.config.MAX_SEARCH_RESULTS]:
+            # Simplified search - in practice use DuckDuckGoSearchRun
+            urls.extend([
+                f"https://example.com/search?q={query.replace(' ', '+')}",
+                f"https://en.wikipedia.org/wiki/{query.replace(' ', '_')}"
+            ][:2])  # Top 2 URLs per query
+        return urls
+    
+    async def synthesize(self, topic: str, contents: List[str]) -> str:
+        """Step 4: Synthesize - Generate final report"""
+        context = "\n\n".join(contents)
+        synthesis_prompt = (
+            f"You are a research analyst. Summarize the following information to answer: '{topic}'\n\n"
+            f"Context:\n{context}\n\n"
+            "Provide a concise, well-structured summary with key findings."
+        )
+        
+        synthesis_messages = [
+            {"role": "system", "content": "You are a research analyst. Summarize information concisely."},
+            {"role": "user", "content": synthesis_prompt}
+        ]
+        
+        synthesis_response = await self.brain.think(synthesis_messages, tools=None, route="synthesize")
+        return synthesis_response.choices[0].message.content
+    
+    @staticmethod
+    def _is_content(result: str) -> bool:
+        return bool(result) and not result.startswith(("Error:", "Scrape error:"))
+    
+    async def perform_research_stream(self, topic: str, deadline: float = None,
+                                      rolling: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming research workflow yielding progress events as they happen.
+        
+        Events: ``plan`` (queries and urls), ``scrape`` (one per finished
+        URL), ``timeout`` (URLs cancelled when the ``deadline`` for the
+        scrape phase passed), ``summary`` and finally ``done``. With
+        ``rolling``, a summary of the sources gathered so far is
+        synthesized while the remaining pages are still being scraped
+        (one at a time, restarted whenever new content has arrived) and
+        yielded with ``final`` false; the last ``summary`` has ``final``
+        true and reuses the rolling one when nothing arrived after it.
+        If synthesis fails, the final summary falls back to the raw
+        excerpts so the caller still gets something. Failures before any
+        content exists yield ``error``.
+        """
+        deadline = self.config.RESEARCH_DEADLINE if deadline is None else deadline
+        started = time.perf_counter()
+        try:
+            queries = await self.plan(topic)
+        except Exception as e:
+            yield {"type": "error", "stage": "plan", "error": str(e)}
+            yield {"type": "done", "elapsed": round(time.perf_counter() - started, 3)}
+            return
+        urls = self.search(queries)
+        yield {"type": "plan", "queries": queries, "urls": urls}
+        
+        # Step 3: Scrape - Fetch content from top URLs in parallel, keeping what finishes in time
+        loop = asyncio.get_running_loop()
+        tasks = {asyncio.ensure_future(self.scrape(url)): url for url in urls}
+        contents, sources = [], []
+        pending = set(tasks)
+        # Rolling synthesis in flight and the last one that finished, each with how many sources it covers
+        summarizing: Optional[Tuple[asyncio.Future, int]] = None
+        rolled: Optional[Tuple[str, int]] = None
+        scraped = False
+        try:
+            give_up_at = loop.time() + deadline
+            while pending:
+                waiting = pending | ({summarizing[0]} if summarizing else set())
+                done, _ = await asyncio.wait(
+                    waiting, timeout=max(0, give_up_at - loop.time()), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if summarizing and task is summarizing[0]:
+                        covered, summarizing = summarizing[1], None
+                        if task.exception() is not None:
+                            logger.warning(f"Rolling summary failed for '{topic}': {task.exception()}")
+                            continue
+                        rolled = (task.result(), covered)
+                        yield {"type": "summary", "text": rolled[0], "sources": sources[:covered],
+                               "partial": True, "synthesized": True, "final": False}
+                        continue
+                    pending.discard(task)
+                    result = task.result()
+                    ok = self._is_content(result)
+                    if ok:
+                        contents.append(result)
+                        sources.append(tasks[task])
+                    yield {"type": "scrape", "url": tasks[task], "ok": ok, "chars": len(result),
+                           "excerpt": result[:200]}
+                # Once nothing is left to scrape, the final synthesis covers the rest
+                if rolling and pending and summarizing is None and len(contents) > (rolled[1] if rolled else 0):
+                    summarizing = (asyncio.ensure_future(self.synthesize(topic, list(contents))), len(contents))
+            if pending:
+                yield {"type": "timeout", "deadline": deadline, "cancelled": [tasks[t] for t in pending]}
+            scraped = True
+        finally:
+            stale = set(pending)
+            if summarizing and (not scraped or summarizing[1] < len(contents)):
+                stale.add(summarizing[0])
+                summarizing = None
+            for task in stale:
+                task.cancel()
+            if stale:
+                await asyncio.gather(*stale, return_exceptions=True)
+        
+        partial = bool(pending) or len(contents) < len(urls)
+        if not contents:
+            yield {"type": "summary", "text": "No relevant information found during research.",
+                   "sources": [], "partial": partial, "synthesized": False, "final": True}
+        else:
+            try:
+                if rolled and rolled[1] == len(contents):
+                    text = rolled[0]
+                elif summarizing:
+                    # Already synthesizing everything we have
+                    text = await summarizing[0]
+                else:
+                    text = await self.synthesize(topic, contents)
+                synthesized = True
+            except Exception as e:
+                yield {"type": "error", "stage": "synthesize", "error": str(e)}
+                text = "\n\n".join(f"Source: {url}\n{content[:500]}" for url, content in zip(sources, contents))
+                synthesized = False
+            yield {"type": "summary", "text": text, "sources": sources, "partial": partial,
+                   "synthesized": synthesized, "final": True}
+        yield {"type": "done", "elapsed": round(time.perf_counter() - started, 3)}
+    
     async def perform_research(self, topic: str) -> str:
         """
         Complete research workflow: Plan -> Search -> Scrape -> Synthesize
         """
         try:
-            # Step 1: Plan - Generate specific search queries
-            plan_prompt = (
-                f"Generate 3 specific, focused search queries for researching the topic: '{topic}'. "
-                "Return ONLY a JSON array of strings like ['query1', 'query2', 'query3']"
-            )
-            
-            plan_messages = [
-                {"role": "system", "content": "You are a research planner. Generate specific search queries."},
-                {"role": "user", "content": plan_prompt}
-            ]
-            
-            plan_response = await self.brain.think(plan_messages, tools=None)
-            queries = json.loads(plan_response.choices[0].message.content)
-            
-            # Step 2: Search - Use DuckDuckGo to find relevant URLs
-            # Note: For Phase 4, we'll use a simple web search approach
-            # In production, consider using DuckDuckGoSearchRun or similar
-            search_results = []
-            for query in queries[:self.config.MAX_SEARCH_RESULTS]:
-                # Simplified search - in practice use DuckDuckGoSearchRun
-                search_results.append({
-                    "query": query,
-                    "urls": [
-                        f"https://example.com/search?q={query.replace(' ', '+')}",
-                        f"https://en.wikipedia.org/wiki/{query.replace(' ', '_')}"
-                    ]
-                })
-            
-            # Step 3: Scrape - Fetch content from top URLs
-            all_content = []
-            scrape_tasks = []
-            
-            for result in search_results:
-                for url in result["urls"][:2]:  # Top 2 URLs per query
-                    scrape_tasks.append(self.scrape(url))
-            
-            # Run scraping in parallel
-            scraped_results = await asyncio.gather(*scrape_tasks)
-            all_content.extend([r for r in scraped_results if r and r != "Scrape error:"])
-            
-            # Step 4: Synthesize - Generate final report
-            if not all_content:
-                return "No relevant information found during research."
-            
-            context = "\n\n".join(all_content)
-            synthesis_prompt = (
-                f"You are a research analyst. Summarize the following information to answer: '{topic}'\n\n"
-                f"Context:\n{context}\n\n"
-                "Provide a concise, well-structured summary with key findings."
-            )
-            
-            synthesis_messages = [
-                {"role": "system", "content": "You are a research analyst. Summarize information concisely."},
-                {"role": "user", "content": synthesis_prompt}
-            ]
-            
-            synthesis_response = await self.brain.think(synthesis_messages, tools=None)
-            return synthesis_response.choices[0].message.content
-            
+            summary = None
+            async for event in self.perform_research_stream(topic):
+                if event["type"] == "error" and event["stage"] == "plan":
+                    return f"Research failed: {event['error']}"
+                if event["type"] == "summary" and event["final"]:
+                    summary = event["text"]
+            return summary or "No relevant information found during research."
         except Exception as e:
-            return f"Research failed: {str(e)}"
\ No newline at end of file
+            return f"Research failed: {str(e)}"
@@ -41,6 +41,11 @@ SYSTEM_TOOLS = [
                     "query": {
                         "type": "string",
                         "description": "The search query to find relevant memories"
+                    },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["hybrid", "vector", "lexical"],
+                        "description": "hybrid (default) combines keyword and semantic search; lexical suits exact IPs, hostnames and file names"
                     }
                 },
                 "required": ["query"]
@@ -64,6 +69,41 @@ SYSTEM_TOOLS = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "run_osint_sweep",
+            "description": "Start a background sweep of many OSINT commands (e.g. ping/whois/nslookup across several targets). Returns a job id immediately; use osint_job_status to collect results. Same command rules as run_osint_command.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "commands": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "The shell commands to run, one per target"
+                    }
+                },
+                "required": ["commands"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "osint_job_status",
+            "description": "Get the status and any finished results of an OSINT sweep started with run_osint_sweep.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "job_id": {
+                        "type": "string",
+                        "description": "The job id returned by run_osint_sweep"
+                    }
+                },
+                "required": ["job_id"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -85,12 +125,16 @@ SYSTEM_TOOLS = [
         "type": "function",
         "function": {
             "name": "read_codebase",
-            "description": "List files or read specific code files to understand the system structure.",
+            "description": "List files or read specific code files to understand the system structure. Large files are returned in pages; use offset/length or start_line/end_line to read the rest.",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "action": {"type": "string", "enum": ["list", "read"]},
-                    "path": {"type": "string", "description": "File path (for read) or Directory path (for list). Default '.'"}
+                    "path": {"type": "string", "description": "File path (for read) or Directory path (for list). Default '.'"},
+                    "offset": {"type": "integer", "description": "Byte offset to start reading from (read only)"},
+                    "length": {"type": "integer", "description": "Number of bytes to read (read only)"},
+                    "start_line": {"type": "integer", "description": "First line to read, 1-based (read only)"},
+                    "end_line": {"type": "integer", "description": "Last line to read, inclusive (read only)"}
                 },
                 "required": ["action"]
             }
@@ -1,13 +1,17 @@
 """API endpoints for Kaien Nexus"""
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
+import os
 import json
+import uuid
 import state
 import tools.shell_agent as shell_agent
 import tools.dev_agent as dev_agent
-from schemas import ToolRequest, SessionMessage
+from schemas import ToolRequest, SessionMessage, OSINTJobRequest
+from shared.tool_registry import ToolNotFoundError, ToolArgumentError, ToolDisabledError
 import config
 import logging
 
@@ -16,6 +20,41 @@ router = APIRouter(prefix="/api/v1")
 logger = logging.getLogger(__name__)
 
 
+# Streaming Handlers
+def _stream_read_file(args: Dict[str, Any]):
+    """Send a file (or a byte range of it) as a chunked body instead of one JSON string"""
+    try:
+        args = state.state.registry.get("read_file").bind(args)
+    except ToolArgumentError as e:
+        return {"error": str(e), "tool": "read_file"}
+    offset, length = args.get("offset") or 0, args.get("length")
+    if offset < 0 or (length is not None and length < 0):
+        return {"error": "offset and length must not be negative", "tool": "read_file"}
+    
+    path = args.get("path") or ""
+    error = dev_agent.dev_agent.check_readable(path)
+    if error:
+        return error
+    
+    chunks = dev_agent.dev_agent.stream_file(
+        path,
+        offset,
+        length,
+        config.config.get("stream_chunk_size", 64 * 1024)
+    )
+    return StreamingResponse(
+        chunks,
+        media_type="application/octet-stream",
+        headers={"X-Kaien-File-Size": str(os.path.getsize(path))}
+    )
+
+
+# Tools that can answer with a streamed body when the request sets ``stream``
+STREAM_HANDLERS = {
+    "read_file": _stream_read_file
+}
+
+
 # API Endpoints
 @router.get("/tools")
 async def list_tools():
@@ -37,28 +76,21 @@ async def execute_tool(request: ToolRequest):
     if not tool_info.get("enabled", True):
         return {"error": "Tool disabled", "tool": tool_name}
     
-    # Route to appropriate tool handler
-    try:
-        if tool_name == "shell":
-            if not config.config.get("allow_shell", True):
-                return {"error": "Shell commands disabled by configuration", "tool": tool_name}
-            
-            result = await shell_agent.shell_agent.execute(
-                args.get("command"),
-                timeout=args.get("timeout", 60),
-                cwd=args.get("cwd")
-            )
-        elif tool_name == "write_file":
-            result = dev_agent.dev_agent.write_file(args.get("path"), args.get("content"))
-        elif tool_name == "read_file":
-            result = dev_agent.dev_agent.read_file(args.get("path"))
-        elif tool_name == "list_files":
-            result = dev_agent.dev_agent.list_files(args.get("path", "."))
-        elif tool_name == "test_code":
-            result = dev_agent.dev_agent.test_code(args.get("code"), args.get("language", "python"))
-        else:
-            result = {"error": "Tool not implemented", "tool": tool_name}
+    if request.stream:
+        stream_handler = STREAM_HANDLERS.get(tool_name)
+        if stream_handler is None:
+            return {"error": "Tool does not support streaming", "tool": tool_name}
+        return stream_handler(args)
     
+    # Dispatch through the tool registry
+    try:
+        result = await state.state.registry.dispatch(tool_name, args)
+    except ToolNotFoundError:
+        result = {"error": "Tool not implemented", "tool": tool_name}
+    except ToolDisabledError:
+        result = {"error": "Tool disabled", "tool": tool_name}
+    except ToolArgumentError as e:
+        result = {"error": str(e), "tool": tool_name}
     except Exception as e:
         logger.error(f"Error executing tool {tool_name}: {str(e)}")
         result = {"error": str(e), "tool": tool_name}
@@ -69,12 +101,12 @@ async def execute_tool(request: ToolRequest):
 @router.post("/session/message")
 async def session_message(message: SessionMessage):
     """Handle session messages"""
-    session = state.state.get_session(message.session_id)
+    session = await state.state.get_session_async(message.session_id)
     if not session:
         state.state.create_session(message.session_id)
     
     # Log the message
-    state.state.log_message(
+    await state.state.log_message_async(
         message.session_id,
         message.message,
         "",  # Assistant response would go here
@@ -87,15 +119,195 @@ async def session_message(message: SessionMessage):
 @router.get("/session/{session_id}/history")
 async def get_session_history(session_id: str, limit: int = 50):
     """Get session history"""
-    history = state.state.get_session_history(session_id, limit)
+    history = await state.state.get_session_history_async(session_id, limit)
     return {"session_id": session_id, "history": history}
 
 
+# OSINT Jobs
+_osint_scheduler = None
+
+
+def get_osint_scheduler():
+    """Create the OSINT scheduler on first use (the OSINT module is optional)"""
+    global _osint_scheduler
+    if _osint_scheduler is None:
+        from modules.osint_jobs import OSINTScheduler
+        _osint_scheduler = OSINTScheduler(
+            max_concurrency=config.config.get("osint_max_concurrency", 8),
+            max_batch=config.config.get("osint_max_batch", 256)
+        )
+    return _osint_scheduler
+
+
+def _osint_enabled() -> bool:
+    return config.config.get("modules", {}).get("osint_agent", False)
+
+
+@router.post("/osint/jobs")
+async def submit_osint_job(request: OSINTJobRequest):
+    """Queue a batch of OSINT commands; returns a job id immediately"""
+    if not _osint_enabled():
+        return {"error": "OSINT module disabled by configuration"}
+    try:
+        job = get_osint_scheduler().submit(request.commands)
+    except ValueError as e:
+        return {"error": str(e)}
+    return job.summary()
+
+
+@router.get("/osint/jobs/{job_id}")
+async def get_osint_job(job_id: str):
+    """Poll an OSINT job for its status and finished results"""
+    job = get_osint_scheduler().get(job_id) if _osint_enabled() else None
+    if job is None:
+        return {"error": "Job not found", "job_id": job_id}
+    return job.snapshot()
+
+
+@router.get("/osint/jobs/{job_id}/stream")
+async def stream_osint_job(job_id: str):
+    """Stream OSINT results as newline-delimited JSON as each command finishes"""
+    job = get_osint_scheduler().get(job_id) if _osint_enabled() else None
+    if job is None:
+        return {"error": "Job not found", "job_id": job_id}
+    
+    async def lines():
+        async for event in job.events():
+            yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.delete("/osint/jobs/{job_id}")
+async def cancel_osint_job(job_id: str):
+    """Cancel a running OSINT job"""
+    cancelled = _osint_enabled() and get_osint_scheduler().cancel(job_id)
+    return {"job_id": job_id, "cancelled": cancelled}
+
+
+@router.get("/stats")
+async def get_stats():
+    """Cache and persistence counters"""
+    return {
+        "sessions": state.state.active_sessions.stats(),
+        "tools": state.state.registry.stats(),
+        "file_io": dev_agent.dev_agent.stats(),
+        "shell_pool": shell_agent.shell_agent.pool.stats(),
+        "osint": _osint_scheduler.stats() if _osint_scheduler else None,
+        "journal": state.state.journal.stats(),
+        "agent": _agent.stats() if _agent else None
+    }
+
+
+# LLM Agent
+_agent = None
+
+
+def get_agent():
+    """Create the LLM orchestrator on first use (it pulls in litellm, ChromaDB and the modules)"""
+    global _agent
+    if _agent is None:
+        from modules.mcp_client import MCPClient
+        # One scheduler for REST and LLM sweeps (shared cache and limits); agent
+        # history lives on the session cache, so it is journaled like any other log
+        _agent = MCPClient(
+            osint_jobs=get_osint_scheduler(),
+            sessions=state.AgentHistoryStore(state.state)
+        )
+    return _agent
+
+
+async def _stream_query(websocket: WebSocket, session_id: str, message: Dict[str, Any]):
+    """Push the model's answer to the client token by token, then log the exchange"""
+    content = message.get("content", "")
+    try:
+        agent = get_agent()
+    except ImportError as e:
+        await websocket.send_text(json.dumps({"session": session_id, "type": "error", "error": str(e)}))
+        return
+    
+    final = ""
+    async for event in agent.process_query_stream(content, session_id=session_id):
+        if event["type"] == "final":
+            final = event["content"]
+        await websocket.send_text(json.dumps({"session": session_id, **event}))
+    await state.state.log_message_async(session_id, content, final, {"channel": "ws"})
+
+
+def _bounded_int(value: Any, default: int, maximum: int) -> int:
+    """Coerce an untrusted client number to an int in 1..maximum, using ``default`` when unusable"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(number, maximum))
+
+
+async def _stream_research(websocket: WebSocket, session_id: str, message: Dict[str, Any]):
+    """Push research progress, rolling summaries included, as sources are scraped"""
+    if not config.config.get("modules", {}).get("research_agent", False):
+        await websocket.send_text(json.dumps({
+            "session": session_id,
+            "type": "error",
+            "error": "Research module disabled by configuration"
+        }))
+        return
+    try:
+        researcher = get_agent().researcher
+    except ImportError as e:
+        await websocket.send_text(json.dumps({"session": session_id, "type": "error", "error": str(e)}))
+        return
+    
+    topic = message.get("topic") or message.get("content", "")
+    if not topic:
+        await websocket.send_text(json.dumps({
+            "session": session_id,
+            "type": "error",
+            "error": "No topic provided for research"
+        }))
+        return
+    max_deadline = max(1, int(researcher.config.RESEARCH_DEADLINE))
+    events = researcher.perform_research_stream(
+        topic,
+        deadline=_bounded_int(message.get("deadline"), max_deadline, max_deadline),
+        rolling=bool(message.get("rolling", True))
+    )
+    final = ""
+    async for event in events:
+        if event["type"] == "summary" and event["final"]:
+            final = event["text"]
+        await websocket.send_text(json.dumps({"session": session_id, **event}))
+    await state.state.log_message_async(session_id, topic, final, {"channel": "ws", "tool": "deep_research"})
+
+
+async def _stream_shell(websocket: WebSocket, session_id: str, message: Dict[str, Any]):
+    """Push shell output to the client chunk by chunk as the command produces it"""
+    shell_tool = state.state.tools.get("shell", {})
+    if not config.config.get("allow_shell", True) or not shell_tool.get("enabled", True):
+        await websocket.send_text(json.dumps({
+            "session": session_id,
+            "type": "error",
+            "error": "Shell commands disabled by configuration"
+        }))
+        return
+    
+    cap = config.config.get("shell_output_cap", 1024 * 1024)
+    max_timeout = config.config.get("shell_max_timeout", 600)
+    events = shell_agent.shell_agent.execute_stream(
+        message.get("command", ""),
+        timeout=_bounded_int(message.get("timeout"), min(60, max_timeout), max_timeout),
+        cwd=message.get("cwd"),
+        max_output=_bounded_int(message.get("max_output"), cap, cap)
+    )
+    async for event in events:
+        await websocket.send_text(json.dumps({"session": session_id, **event}))
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time communication"""
     await websocket.accept()
-    session_id = f"ws_session_{len(state.state.active_sessions) + 1}"
+    session_id = f"ws_session_{uuid.uuid4().hex[:12]}"
     state.state.create_session(session_id)
     
     logger.info(f"WebSocket session {session_id} connected")
@@ -105,6 +317,18 @@ async def websocket_endpoint(websocket: WebSocket):
             data = await websocket.receive_text()
             message = json.loads(data)
             
+            if message.get("type") == "shell":
+                await _stream_shell(websocket, session_id, message)
+                continue
+            
+            if message.get("type") == "query":
+                await _stream_query(websocket, session_id, message)
+                continue
+            
+            if message.get("type") == "research":
+                await _stream_research(websocket, session_id, message)
+                continue
+            
             # Process message
             response = {
                 "session": session_id,
@@ -121,7 +345,25 @@ async def websocket_endpoint(websocket: WebSocket):
         await websocket.close(code=1011)
 
 
+# Tool Handlers
+async def run_shell(command: str, timeout: int = 60, cwd: str = None, session_id: str = None):
+    """Shell tool handler, gated by the allow_shell setting"""
+    if not config.config.get("allow_shell", True):
+        return {"error": "Shell commands disabled by configuration", "tool": "shell"}
+    return await shell_agent.shell_agent.execute(command, timeout=timeout, cwd=cwd, session_id=session_id)
+
+
 # Tool Registration
+def _register(name: str, handler, description: str, parameters: Dict[str, Any], module: str):
+    state.state.register_tool({
+        "name": name,
+        "description": description,
+        "parameters": parameters,
+        "enabled": config.config.get("modules", {}).get(module, True),
+        "max_concurrency": config.config.get("tool_concurrency", {}).get(name)
+    }, handler=handler)
+
+
 @router.on_event("startup")
 async def register_tools():
     """Register tools on startup"""
@@ -129,54 +371,46 @@ async def register_tools():
     logger.info("Registering tools...")
     
     # Register shell tool
-    state.state.register_tool({
-        "name": "shell",
-        "description": "Execute shell commands",
-        "parameters": {
-            "command": {"type": "string", "required": True},
-            "timeout": {"type": "integer", "default": 60},
-            "cwd": {"type": "string", "default": None}
-        },
-        "enabled": config.config.get("modules", {}).get("shell_agent", True)
-    })
-    
-    # Register file operations
-    state.state.register_tool({
-        "name": "write_file",
-        "description": "Write content to a file",
-        "parameters": {
-            "path": {"type": "string", "required": True},
-            "content": {"type": "string", "required": True}
-        },
-        "enabled": config.config.get("modules", {}).get("dev_agent", True)
-    })
+    _register("shell", run_shell, "Execute shell commands", {
+        "command": {"type": "string", "required": True},
+        "timeout": {"type": "integer", "default": 60},
+        "cwd": {"type": "string", "default": None},
+        "session_id": {"type": "string", "default": None}
+    }, "shell_agent")
     
-    state.state.register_tool({
-        "name": "read_file",
-        "description": "Read content from a file",
-        "parameters": {
-            "path": {"type": "string", "required": True}
-        },
-        "enabled": config.config.get("modules", {}).get("dev_agent", True)
-    })
+    # Register file operations (run on the dev agent's file I/O pool)
+    _register("write_file", dev_agent.dev_agent.write_file_async, "Write content to a file", {
+        "path": {"type": "string", "required": True},
+        "content": {"type": "string", "required": True}
+    }, "dev_agent")
     
-    state.state.register_tool({
-        "name": "list_files",
-        "description": "List files in a directory",
-        "parameters": {
-            "path": {"type": "string", "default": "."}
-        },
-        "enabled": config.config.get("modules", {}).get("dev_agent", True)
-    })
+    _register("read_file", dev_agent.dev_agent.read_file_async, "Read content from a file", {
+        "path": {"type": "string", "required": True},
+        "offset": {"type": "integer", "default": None},
+        "length": {"type": "integer", "default": None},
+        "start_line": {"type": "integer", "default": None},
+        "end_line": {"type": "integer", "default": None}
+    }, "dev_agent")
     
-    state.state.register_tool({
-        "name": "test_code",
-        "description": "Test code syntax",
-        "parameters": {
-            "code": {"type": "string", "required": True},
-            "language": {"type": "string", "default": "python"}
-        },
-        "enabled": config.config.get("modules", {}).get("dev_agent", True)
-    })
-    
-    logger.info(f"Tools registered successfully: {list(state.state.tools.keys())}")
\ No newline at end of file
+    _register("list_files", dev_agent.dev_agent.list_files_async, "List files in a directory", {
+        "path": {"type": "string", "default": "."}
+    }, "dev_agent")
+    
+    _register("test_code", dev_agent.dev_agent.test_code, "Test code syntax", {
+        "code": {"type": "string", "required": True},
+        "language": {"type": "string", "default": "python"}
+    }, "dev_agent")
+    
+    logger.info(f"Tools registered successfully: {list(state.state.tools.keys())}")
+
+
+@router.on_event("shutdown")
+async def shutdown_state():
+    """Flush queued writes before the process exits"""
+    dev_agent.dev_agent.shutdown()
+    await shell_agent.shell_agent.close()
+    if _osint_scheduler is not None:
+        await _osint_scheduler.osint.close()
+    if _agent is not None:
+        await _agent.close()
+    state.state.shutdown()
@@ -15,16 +15,50 @@ class KaienConfig(BaseModel):
     
     # Database settings
     db_path: str = "kaien.db"
+    db_pool_size: int = 4
+    journal_batch_size: int = 64
+    journal_flush_ms: int = 50
+    journal_max_queue: int = 10000
+    journal_flush_timeout: float = 5.0
+    
+    # Session cache settings
+    session_cache_size: int = 256
+    session_ttl_seconds: int = 3600
+    session_history_limit: int = 200
     
     # Security settings
     safe_commands: list = ["ls", "mkdir", "cd", "pwd", "echo", "cat", "grep", "find"]
     allow_shell: bool = True
+    shell_output_cap: int = 1024 * 1024
+    shell_persistent_workers: bool = True
+    shell_pool_size: int = 8
+    shell_max_sessions: int = 32
+    shell_idle_timeout: int = 300
+    shell_max_timeout: int = 600
+    
+    # Tool dispatch settings
+    tool_default_concurrency: int = 4
+    tool_concurrency: Dict[str, int] = {
+        "shell": 4,
+        "write_file": 8,
+        "read_file": 8,
+        "list_files": 8,
+        "test_code": 2
+    }
+    file_io_workers: int = 8
+    read_file_max_bytes: int = 1024 * 1024
+    read_file_mmap_threshold: int = 8 * 1024 * 1024
+    stream_chunk_size: int = 64 * 1024
     
     # LLM settings
     llm_provider: str = "openai"
     llm_model: str = "gpt-4"
     llm_api_key: str = ""
     
+    # OSINT scheduler settings
+    osint_max_concurrency: int = 8
+    osint_max_batch: int = 256
+    
     # Module settings
     modules: Dict[str, bool] = {
         "shell_agent": True,
@@ -57,6 +91,54 @@ class ConfigManager:
         if "KAIEN_DB_PATH" in os.environ:
             config.db_path = os.environ["KAIEN_DB_PATH"]
         
+        if "KAIEN_DB_POOL_SIZE" in os.environ:
+            config.db_pool_size = int(os.environ["KAIEN_DB_POOL_SIZE"])
+        
+        if "KAIEN_JOURNAL_BATCH_SIZE" in os.environ:
+            config.journal_batch_size = int(os.environ["KAIEN_JOURNAL_BATCH_SIZE"])
+        
+        if "KAIEN_JOURNAL_FLUSH_MS" in os.environ:
+            config.journal_flush_ms = int(os.environ["KAIEN_JOURNAL_FLUSH_MS"])
+        
+        if "KAIEN_JOURNAL_MAX_QUEUE" in os.environ:
+            config.journal_max_queue = int(os.environ["KAIEN_JOURNAL_MAX_QUEUE"])
+        
+        if "KAIEN_JOURNAL_FLUSH_TIMEOUT" in os.environ:
+            config.journal_flush_timeout = float(os.environ["KAIEN_JOURNAL_FLUSH_TIMEOUT"])
+        
+        if "KAIEN_SESSION_CACHE_SIZE" in os.environ:
+            config.session_cache_size = int(os.environ["KAIEN_SESSION_CACHE_SIZE"])
+        
+        if "KAIEN_SESSION_TTL" in os.environ:
+            config.session_ttl_seconds = int(os.environ["KAIEN_SESSION_TTL"])
+        
+        if "KAIEN_SESSION_HISTORY_LIMIT" in os.environ:
+            config.session_history_limit = int(os.environ["KAIEN_SESSION_HISTORY_LIMIT"])
+        
+        if "KAIEN_SHELL_OUTPUT_CAP" in os.environ:
+            config.shell_output_cap = int(os.environ["KAIEN_SHELL_OUTPUT_CAP"])
+        
+        if "KAIEN_SHELL_PERSISTENT" in os.environ:
+            config.shell_persistent_workers = os.environ["KAIEN_SHELL_PERSISTENT"].lower() == "true"
+        
+        if "KAIEN_SHELL_IDLE_TIMEOUT" in os.environ:
+            config.shell_idle_timeout = int(os.environ["KAIEN_SHELL_IDLE_TIMEOUT"])
+        
+        if "KAIEN_SHELL_MAX_TIMEOUT" in os.environ:
+            config.shell_max_timeout = int(os.environ["KAIEN_SHELL_MAX_TIMEOUT"])
+        
+        if "KAIEN_TOOL_CONCURRENCY" in os.environ:
+            config.tool_default_concurrency = int(os.environ["KAIEN_TOOL_CONCURRENCY"])
+        
+        if "KAIEN_FILE_IO_WORKERS" in os.environ:
+            config.file_io_workers = int(os.environ["KAIEN_FILE_IO_WORKERS"])
+        
+        if "KAIEN_READ_FILE_MAX_BYTES" in os.environ:
+            config.read_file_max_bytes = int(os.environ["KAIEN_READ_FILE_MAX_BYTES"])
+        
+        if "KAIEN_OSINT_MAX_CONCURRENCY" in os.environ:
+            config.osint_max_concurrency = int(os.environ["KAIEN_OSINT_MAX_CONCURRENCY"])
+        
         if "LLM_PROVIDER" in os.environ:
             config.llm_provider = os.environ["LLM_PROVIDER"]
         
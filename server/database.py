@@ -1,43 +1,311 @@
-# Database Layer: SQLite + ChromaDB
+"""Database layer for Kaien Nexus - pooled SQLite store (ChromaDB lives in modules.memory)"""
+
+import asyncio
+import json
+import logging
+import queue
 import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _loads(value: Optional[str], default: Any = None) -> Any:
+    """Decode a JSON column, passing through legacy plain-text values"""
+    if value is None:
+        return default
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class KaienDatabase:
+    """SQLite store with one dedicated writer thread and a pool of read connections.
+
+    The database runs in WAL mode so readers never wait on the writer. All
+    writes are funnelled through a single background thread; callers get a
+    ``Future`` back (or block on it with ``wait=True``), so the event loop
+    never touches the disk directly.
+    """
+
+    def __init__(self, db_path: str = "kaien.db", pool_size: int = 4, busy_timeout_ms: int = 5000):
+        self.db_path = str(db_path)
+        self.pool_size = max(1, pool_size)
+        self.busy_timeout_ms = busy_timeout_ms
+
+        parent = Path(self.db_path).parent
+        parent.mkdir(parents=True, exist_ok=True)
+
+        # Schema and journal mode are set up front so readers can start immediately
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._init_tables(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._read_executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="kaien-db-read")
 
-DB_PATH = Path("data/kaien.db")
+        self._writes: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="kaien-db-writer", daemon=True)
+        self._writer.start()
 
-class SessionDB:
-    def __init__(self):
-        DB_PATH.parent.mkdir(exist_ok=True)
-        self.conn = sqlite3.connect(DB_PATH)
-        self._init_tables()
-    
-    def _init_tables(self):
-        self.conn.execute(
+    # --- Connections ---
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _init_tables(self, conn: sqlite3.Connection):
+        conn.executescript(
             """
             CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                user_message TEXT,
+                assistant_message TEXT,
+                metadata TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_session_id ON sessions (session_id, id);
+
+            CREATE TABLE IF NOT EXISTS session_state (
                 id TEXT PRIMARY KEY,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                state JSON
-            )
+                state TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS system_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+
+            CREATE TABLE IF NOT EXISTS tools (
+                name TEXT PRIMARY KEY,
+                description TEXT,
+                parameters TEXT,
+                enabled INTEGER DEFAULT 1
+            );
+            """
+        )
+
+    @contextmanager
+    def _reader(self):
+        """Borrow a read connection from the pool, opening one if the pool is not full yet"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._reader_lock:
+                can_open = self._reader_count < self.pool_size
+                if can_open:
+                    self._reader_count += 1
+            conn = self._connect(read_only=True) if can_open else self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    async def _read_async(self, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, fn, *args)
+
+    # --- Writer thread ---
+    def _writer_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self._writes.get()
+                if item is _STOP:
+                    break
+                future, fn, args = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with conn:
+                        result = fn(conn, *args)
+                    future.set_result(result)
+                except Exception as e:
+                    logger.error(f"Database write failed: {str(e)}")
+                    future.set_exception(e)
+        finally:
+            conn.close()
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        """Queue a write for the writer thread; ``fn`` receives the writer connection"""
+        if self._closed:
+            raise RuntimeError("Database is closed")
+        future: Future = Future()
+        self._writes.put((future, fn, args))
+        return future
+
+    def _write(self, fn: Callable, *args, wait: bool = True):
+        future = self._submit(fn, *args)
+        return future.result() if wait else future
+
+    async def _write_async(self, fn: Callable, *args) -> Any:
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def flush(self):
+        """Block until every write queued so far has been committed"""
+        self._write(lambda conn: None)
+
+    def close(self):
+        """Drain pending writes and close all connections"""
+        if self._closed:
+            return
+        self._closed = True
+        self._writes.put(_STOP)
+        self._writer.join()
+        self._read_executor.shutdown(wait=True)
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # --- Tools ---
+    @staticmethod
+    def _register_tool(conn, name, description, parameters, enabled):
+        conn.execute(
             """
+            INSERT INTO tools (name, description, parameters, enabled) VALUES (?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET description=excluded.description,
+                parameters=excluded.parameters, enabled=excluded.enabled
+            """,
+            (name, description, json.dumps(parameters), int(enabled)),
+        )
+
+    def register_tool(self, name: str, description: str, parameters: Dict, enabled: bool = True, wait: bool = True):
+        return self._write(self._register_tool, name, description, parameters, enabled, wait=wait)
+
+    def get_tools(self) -> List[Dict[str, Any]]:
+        with self._reader() as conn:
+            rows = conn.execute("SELECT name, description, parameters, enabled FROM tools").fetchall()
+        return [
+            {
+                "name": row["name"],
+                "description": row["description"],
+                "parameters": _loads(row["parameters"], {}),
+                "enabled": bool(row["enabled"]),
+            }
+            for row in rows
+        ]
+
+    # --- Session logs ---
+    @staticmethod
+    def _log_session(conn, session_id, user_message, assistant_message, metadata):
+        conn.execute(
+            "INSERT INTO sessions (session_id, user_message, assistant_message, metadata) VALUES (?, ?, ?, ?)",
+            (session_id, user_message, assistant_message, json.dumps(metadata or {})),
+        )
+
+    def log_session(self, session_id: str, user_message: str, assistant_message: str,
+                    metadata: Optional[Dict] = None, wait: bool = True):
+        """Append one exchange to the session log"""
+        return self._write(self._log_session, session_id, user_message, assistant_message, metadata, wait=wait)
+
+    @staticmethod
+    def _log_sessions(conn, rows):
+        conn.executemany(
+            "INSERT INTO sessions (session_id, user_message, assistant_message, metadata) VALUES (?, ?, ?, ?)",
+            [(sid, user, assistant, json.dumps(metadata or {})) for sid, user, assistant, metadata in rows],
         )
-        self.conn.commit()
-    
-    def save_session(self, session_id: str, state: dict):
-        self.conn.execute(
+        return len(rows)
+
+    def log_sessions(self, rows: List[tuple], wait: bool = True):
+        """Append many ``(session_id, user, assistant, metadata)`` rows in a single transaction"""
+        return self._write(self._log_sessions, list(rows), wait=wait)
+
+    async def log_session_async(self, session_id: str, user_message: str, assistant_message: str,
+                                metadata: Optional[Dict] = None):
+        return await self._write_async(self._log_session, session_id, user_message, assistant_message, metadata)
+
+    def get_session_history(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return the most recent ``limit`` exchanges, oldest first"""
+        with self._reader() as conn:
+            rows = conn.execute(
+                """
+                SELECT user_message, assistant_message, metadata, timestamp FROM sessions
+                WHERE session_id = ? ORDER BY id DESC LIMIT ?
+                """,
+                (session_id, limit),
+            ).fetchall()
+        return [
+            {
+                "user": row["user_message"],
+                "assistant": row["assistant_message"],
+                "metadata": _loads(row["metadata"], {}),
+                "timestamp": row["timestamp"],
+            }
+            for row in reversed(rows)
+        ]
+
+    async def get_session_history_async(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self._read_async(self.get_session_history, session_id, limit)
+
+    # --- Session state ---
+    @staticmethod
+    def _save_session(conn, session_id, state):
+        conn.execute(
             """
-            INSERT INTO sessions (id, state) VALUES (?, ?)
-            ON CONFLICT(id) DO UPDATE SET state=?, updated_at=CURRENT_TIMESTAMP
+            INSERT INTO session_state (id, state) VALUES (?, ?)
+            ON CONFLICT(id) DO UPDATE SET state=excluded.state, updated_at=CURRENT_TIMESTAMP
             """,
-            (session_id, state, state),
+            (session_id, json.dumps(state)),
         )
-        self.conn.commit()
-    
+
+    def save_session(self, session_id: str, state: dict, wait: bool = True):
+        return self._write(self._save_session, session_id, state, wait=wait)
+
     def get_session(self, session_id: str) -> dict:
-        cursor = self.conn.execute(
-            "SELECT state FROM sessions WHERE id = ?", (session_id,)
+        with self._reader() as conn:
+            row = conn.execute("SELECT state FROM session_state WHERE id = ?", (session_id,)).fetchone()
+        return _loads(row["state"], {}) if row else {}
+
+    # --- System state ---
+    @staticmethod
+    def _set_state(conn, key, value):
+        conn.execute(
+            "INSERT INTO system_state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, json.dumps(value)),
         )
-        result = cursor.fetchone()
-        return result[0] if result else {}
 
-# ChromaDB will be initialized separately for vector memory
\ No newline at end of file
+    def set_state(self, key: str, value: Any, wait: bool = True):
+        return self._write(self._set_state, key, value, wait=wait)
+
+    def get_state(self, key: str, default: Any = None) -> Any:
+        with self._reader() as conn:
+            row = conn.execute("SELECT value FROM system_state WHERE key = ?", (key,)).fetchone()
+        return _loads(row["value"], default) if row else default
+
+
+_instances: Dict[str, KaienDatabase] = {}
+_instances_lock = threading.Lock()
+
+
+def get_database(db_path: str = "kaien.db", pool_size: int = 4) -> KaienDatabase:
+    """Return the shared database for ``db_path``, creating it on first use"""
+    key = str(Path(db_path).resolve())
+    with _instances_lock:
+        db = _instances.get(key)
+        if db is None or db._closed:
+            db = KaienDatabase(db_path, pool_size=pool_size)
+            _instances[key] = db
+        return db
@@ -1,10 +1,7 @@
 # Dependency Injection for FastAPI
-from fastapi import Depends
-from .database import SessionDB
+from .config import config
+from .database import KaienDatabase, get_database
 
-def get_db():
-    db = SessionDB()
-    try:
-        yield db
-    finally:
-        db.conn.close()
\ No newline at end of file
+def get_db() -> KaienDatabase:
+    # Shared pooled store; connections are reused across requests
+    return get_database(config.get("db_path", "kaien.db"), pool_size=config.get("db_pool_size", 4))
@@ -0,0 +1,187 @@
+"""Session Journal - write-behind group commit for session logs"""
+
+import asyncio
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class JournalFullError(RuntimeError):
+    """Raised when the journal stays full for longer than the put timeout"""
+
+
+class SessionJournal:
+    """Buffers session log rows and commits them in batches.
+
+    A batch is written as one transaction when ``batch_size`` rows are
+    queued or ``flush_interval_ms`` has passed since the first row of the
+    batch, whichever comes first. The queue is bounded: producers block for
+    up to ``put_timeout`` seconds when it is full, which pushes back on
+    callers instead of letting the backlog grow without limit.
+
+    A batch that fails with ``sqlite3.OperationalError`` (locked database,
+    full disk) is retried with exponential backoff up to ``max_backoff``
+    seconds for as long as the journal is open; newer rows wait behind it,
+    so a stuck database ends in backpressure rather than lost rows. On
+    close it gets ``max_retries`` more attempts. Any other error means a
+    row itself is bad: the batch is then written row by row and only the
+    rows that still fail are dropped.
+    """
+
+    def __init__(self, db, batch_size: int = 64, flush_interval_ms: int = 50,
+                 max_queue: int = 10000, put_timeout: float = 5.0, flush_timeout: float = 5.0,
+                 retry_backoff: float = 0.05, max_backoff: float = 2.0, max_retries: int = 3):
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0, flush_interval_ms) / 1000
+        self.put_timeout = put_timeout
+        self.flush_timeout = flush_timeout
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._closing = threading.Event()
+        self._stats = {"rows": 0, "batches": 0, "failed_rows": 0, "retries": 0, "flush_timeouts": 0,
+                       "max_batch": 0, "last_commit_ms": 0.0}
+
+        self._thread = threading.Thread(target=self._run, name="kaien-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- Producers ---
+    def append(self, session_id: str, user_message: str, assistant_message: str, metadata: Optional[Dict] = None):
+        """Queue one exchange, blocking while the journal is full"""
+        if self._closed:
+            raise RuntimeError("Journal is closed")
+        try:
+            self._queue.put((session_id, user_message, assistant_message, metadata), timeout=self.put_timeout)
+        except queue.Full:
+            raise JournalFullError(f"Session journal full ({self._queue.maxsize} rows pending)")
+
+    async def append_async(self, session_id: str, user_message: str, assistant_message: str,
+                           metadata: Optional[Dict] = None):
+        """Queue one exchange without blocking the event loop when the journal is full"""
+        if self._closed:
+            raise RuntimeError("Journal is closed")
+        row = (session_id, user_message, assistant_message, metadata)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.append, *row)
+
+    # --- Flushing ---
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every row queued so far has been committed.
+
+        Gives up after ``timeout`` seconds (``flush_timeout`` by default)
+        and returns False, so a stuck database delays readers instead of
+        hanging them.
+        """
+        if self._closed:
+            return True
+        timeout = self.flush_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        # The flusher sets the marker once every row queued ahead of it is committed
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+            done = marker.wait(max(0, deadline - time.monotonic()))
+        except queue.Full:
+            done = False
+        if not done:
+            self._stats["flush_timeouts"] += 1
+            logger.warning(f"Session journal flush timed out after {timeout}s ({self._queue.qsize()} rows pending)")
+        return done
+
+    async def flush_async(self, timeout: Optional[float] = None) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.flush, timeout)
+
+    def close(self):
+        """Commit everything still queued and stop the flusher thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._closing.set()
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "pending": self._queue.qsize()}
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, markers = [], []
+            stopping = self._take(self._queue.get(), batch, markers)
+
+            deadline = time.monotonic() + self.flush_interval
+            # A waiting flush commits right away instead of waiting out the interval
+            while not stopping and not markers and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                stopping = self._take(item, batch, markers)
+
+            if batch:
+                self._commit(batch)
+            for marker in markers:
+                marker.set()
+
+    @staticmethod
+    def _take(item, batch, markers) -> bool:
+        """Sort one queued item into rows or flush markers; True for the stop sentinel"""
+        if item is _STOP:
+            return True
+        (markers if isinstance(item, threading.Event) else batch).append(item)
+        return False
+
+    def _commit(self, batch):
+        attempt = shutdown_attempts = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                self.db.log_sessions(batch)
+            except sqlite3.OperationalError as e:
+                attempt += 1
+                shutdown_attempts += self._closing.is_set()
+                if shutdown_attempts > self.max_retries:
+                    self._stats["failed_rows"] += len(batch)
+                    logger.error(f"Dropping {len(batch)} session log rows at shutdown after {attempt} attempts: {str(e)}")
+                    return
+                self._stats["retries"] += 1
+                # Backoff starts over at shutdown so close() is not held up by a long wait
+                delay = min(self.retry_backoff * 2 ** ((shutdown_attempts or attempt) - 1), self.max_backoff)
+                logger.warning(f"Failed to commit {len(batch)} session log rows, retrying in {delay:.2f}s: {str(e)}")
+                if self._closing.is_set():
+                    time.sleep(delay)
+                else:
+                    self._closing.wait(delay)
+                continue
+            except Exception as e:
+                if len(batch) == 1:
+                    self._stats["failed_rows"] += 1
+                    logger.error(f"Dropping unwritable session log row for {batch[0][0]}: {str(e)}")
+                    return
+                # One bad row fails the whole transaction; keep the others
+                for row in batch:
+                    self._commit([row])
+                return
+
+            self._stats["rows"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+            self._stats["last_commit_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            return
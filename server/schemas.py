@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List
 
 class AgentRequest(BaseModel):
     query: str
@@ -7,4 +7,24 @@ class AgentRequest(BaseModel):
 class AgentResponse(BaseModel):
     status: str
     result: str
-    details: Optional[Any] = None
\ No newline at end of file
+    details: Optional[Any] = None
+
+class ToolDefinition(BaseModel):
+    name: str
+    description: str
+    parameters: Dict[str, Any] = {}
+    enabled: bool = True
+    max_concurrency: Optional[int] = None
+
+class ToolRequest(BaseModel):
+    tool: str
+    args: Dict[str, Any] = {}
+    stream: bool = False
+
+class SessionMessage(BaseModel):
+    session_id: str
+    message: str
+    metadata: Optional[Dict[str, Any]] = None
+
+class OSINTJobRequest(BaseModel):
+    commands: List[str]
@@ -0,0 +1,136 @@
+"""Session Cache - bounded LRU/TTL store for active session state"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCache:
+    """Keeps the most recently used sessions in memory.
+
+    At most ``max_sessions`` sessions stay resident; the least recently used
+    one is dropped when a new one arrives, and sessions idle for longer than
+    ``ttl_seconds`` expire on their next lookup. Each history is capped at
+    ``history_limit`` entries. Session logs are already persisted, so an
+    evicted session is rebuilt through the async ``loader`` the next time
+    it is asked for with ``get_async``; the sync ``get`` only sees resident
+    sessions and never touches storage.
+    """
+
+    def __init__(self, loader: Optional[Callable[[str, int], Awaitable[List[Dict]]]] = None, max_sessions: int = 256,
+                 ttl_seconds: float = 3600, history_limit: int = 200):
+        self.loader = loader
+        self.max_sessions = max(1, max_sessions)
+        self.ttl_seconds = ttl_seconds
+        self.history_limit = max(1, history_limit)
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "rehydrations": 0}
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session is not None and not self._expired(session)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expired(self, session: Dict[str, Any]) -> bool:
+        return bool(self.ttl_seconds) and time.monotonic() - session["last_access"] > self.ttl_seconds
+
+    def _new_session(self, history: List[Dict] = None) -> Dict[str, Any]:
+        return {
+            "history": history or [],
+            "status": "active",
+            "created_at": time.time(),
+            "last_access": time.monotonic()
+        }
+
+    def _insert(self, session_id: str, session: Dict[str, Any]):
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            evicted_id, _ = self._sessions.popitem(last=False)
+            self._counters["evictions"] += 1
+            logger.debug(f"Evicted session from cache: {evicted_id}")
+
+    def create(self, session_id: str) -> Dict[str, Any]:
+        """Start a fresh, empty session (replacing any cached copy)"""
+        with self._lock:
+            session = self._new_session()
+            self._insert(session_id, session)
+            return session
+
+    def _resident(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._expired(session):
+                del self._sessions[session_id]
+                self._counters["expirations"] += 1
+                session = None
+
+            if session is not None:
+                self._counters["hits"] += 1
+                session["last_access"] = time.monotonic()
+                self._sessions.move_to_end(session_id)
+                return session
+
+            self._counters["misses"] += 1
+            return None
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return a resident session, or ``None``"""
+        return self._resident(session_id)
+
+    async def get_async(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return a session, rehydrating it from storage if it is not resident"""
+        session = self._resident(session_id)
+        if session is not None or self.loader is None:
+            return session
+
+        # Loaded without holding the lock; the event loop keeps serving other sessions meanwhile
+        history = await self.loader(session_id, self.history_limit)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                # Created or rehydrated by someone else while we were loading
+                return session
+            if not history:
+                return None
+
+            session = self._new_session(list(history))
+            session["status"] = "rehydrated"
+            self._insert(session_id, session)
+            self._counters["rehydrations"] += 1
+            return session
+
+    def _append_to(self, session: Dict[str, Any], entry: Dict[str, Any]):
+        history = session["history"]
+        history.append(entry)
+        if len(history) > self.history_limit:
+            del history[:len(history) - self.history_limit]
+
+    def append(self, session_id: str, entry: Dict[str, Any]):
+        """Append to a resident session's history (creating it if absent), keeping the newest ``history_limit`` entries"""
+        with self._lock:
+            self._append_to(self.get(session_id) or self.create(session_id), entry)
+
+    async def append_async(self, session_id: str, entry: Dict[str, Any]):
+        """Like ``append`` but rehydrates a non-resident session first, so its stored history is kept"""
+        session = await self.get_async(session_id)
+        with self._lock:
+            self._append_to(session or self.create(session_id), entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0
+            }
@@ -1,7 +1,10 @@
 """State management for Kaien system"""
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional
+from shared.tool_registry import ToolRegistry
 import database
+import journal
+import session_cache
 import schemas
 import config
 import logging
@@ -11,8 +14,24 @@ logger = logging.getLogger(__name__)
 
 class KaienState:
     def __init__(self):
-        self.db = database.KaienDatabase(db_path=config.config.get("db_path", "kaien.db"))
-        self.active_sessions: Dict[str, Dict] = {}
+        self.db = database.get_database(
+            config.config.get("db_path", "kaien.db"),
+            pool_size=config.config.get("db_pool_size", 4)
+        )
+        self.journal = journal.SessionJournal(
+            self.db,
+            batch_size=config.config.get("journal_batch_size", 64),
+            flush_interval_ms=config.config.get("journal_flush_ms", 50),
+            max_queue=config.config.get("journal_max_queue", 10000),
+            flush_timeout=config.config.get("journal_flush_timeout", 5.0)
+        )
+        self.active_sessions = session_cache.SessionCache(
+            loader=self.get_session_history_async,
+            max_sessions=config.config.get("session_cache_size", 256),
+            ttl_seconds=config.config.get("session_ttl_seconds", 3600),
+            history_limit=config.config.get("session_history_limit", 200)
+        )
+        self.registry = ToolRegistry(default_concurrency=config.config.get("tool_default_concurrency", 4))
         self._load_tools()
     
     def _load_tools(self):
@@ -21,8 +40,8 @@ class KaienState:
         self.tools = {tool["name"]: tool for tool in tools_data}
         logger.info(f"Loaded {len(self.tools)} tools from database")
     
-    def register_tool(self, tool: schemas.ToolDefinition):
-        """Register a new tool"""
+    def register_tool(self, tool: schemas.ToolDefinition, handler: Optional[Callable] = None):
+        """Register a new tool, and its handler in the dispatch registry when given"""
         tool_dict = tool.dict() if isinstance(tool, schemas.ToolDefinition) else tool
         self.db.register_tool(
             tool_dict["name"],
@@ -31,39 +50,60 @@ class KaienState:
             tool_dict.get("enabled", True)
         )
         self.tools[tool_dict["name"]] = tool_dict
+        if handler is not None:
+            self.registry.register(
+                tool_dict["name"],
+                handler,
+                description=tool_dict["description"],
+                parameters=tool_dict["parameters"],
+                max_concurrency=tool_dict.get("max_concurrency"),
+                enabled=tool_dict.get("enabled", True)
+            )
         logger.info(f"Registered tool: {tool_dict['name']}")
     
     def create_session(self, session_id: str):
         """Create a new session"""
-        self.active_sessions[session_id] = {
-            "history": [],
-            "status": "active",
-            "created_at": None
-        }
+        self.active_sessions.create(session_id)
         logger.info(f"Created session: {session_id}")
     
     def get_session(self, session_id: str):
-        """Get session information"""
+        """Get session information (resident sessions only)"""
         return self.active_sessions.get(session_id)
     
+    async def get_session_async(self, session_id: str):
+        """Get session information, rehydrating it from the database if it was evicted"""
+        return await self.active_sessions.get_async(session_id)
+    
+    @staticmethod
+    def _history_entry(user_message: str, assistant_message: str, metadata: Dict = None) -> Dict:
+        return {"user": user_message, "assistant": assistant_message, "metadata": metadata or {}}
+    
+    def _append_history(self, session_id: str, user_message: str, assistant_message: str, metadata: Dict = None):
+        self.active_sessions.append(session_id, self._history_entry(user_message, assistant_message, metadata))
+    
     def log_message(self, session_id: str, user_message: str, assistant_message: str, metadata: Dict = None):
         """Log a message to session history"""
-        if session_id not in self.active_sessions:
-            self.create_session(session_id)
+        self._append_history(session_id, user_message, assistant_message, metadata)
         
-        self.active_sessions[session_id]["history"].append({
-            "user": user_message,
-            "assistant": assistant_message,
-            "metadata": metadata or {}
-        })
-        
-        # Also log to database
-        self.db.log_session(session_id, user_message, assistant_message, metadata)
+        # Persisted by the journal in group-committed batches
+        self.journal.append(session_id, user_message, assistant_message, metadata)
+    
+    async def log_message_async(self, session_id: str, user_message: str, assistant_message: str, metadata: Dict = None):
+        """Log a message without blocking the event loop on journal backpressure or rehydration"""
+        await self.active_sessions.append_async(
+            session_id, self._history_entry(user_message, assistant_message, metadata))
+        await self.journal.append_async(session_id, user_message, assistant_message, metadata)
     
     def get_session_history(self, session_id: str, limit: int = 100) -> List[Dict]:
         """Get session history"""
+        self.journal.flush()
         return self.db.get_session_history(session_id, limit)
     
+    async def get_session_history_async(self, session_id: str, limit: int = 100) -> List[Dict]:
+        """Get session history on a pooled read connection"""
+        await self.journal.flush_async()
+        return await self.db.get_session_history_async(session_id, limit)
+    
     def set_state(self, key: str, value: Any):
         """Set system state"""
         self.db.set_state(key, value)
@@ -71,6 +111,41 @@ class KaienState:
     def get_state(self, key: str, value: Any = None):
         """Get system state"""
         return self.db.get_state(key, value)
+    
+    def shutdown(self):
+        """Flush pending writes and close the database"""
+        self.journal.close()
+        self.db.close()
+
+
+class AgentHistoryStore:
+    """Agent conversation history kept on the session cache entries.
+    
+    The full transcript (tool calls included) lives on the resident
+    session; once a session has been evicted or the server restarted, the
+    conversation is rebuilt from its persisted user/assistant log.
+    """
+    
+    def __init__(self, kaien_state: "KaienState"):
+        self.state = kaien_state
+    
+    async def get(self, session_id: str) -> List[Dict]:
+        session = await self.state.get_session_async(session_id)
+        if session is None:
+            return []
+        if "agent_messages" in session:
+            return session["agent_messages"]
+        messages = []
+        for entry in session["history"]:
+            if entry.get("user"):
+                messages.append({"role": "user", "content": entry["user"]})
+            if entry.get("assistant"):
+                messages.append({"role": "assistant", "content": entry["assistant"]})
+        return messages
+    
+    def set(self, session_id: str, messages: List[Dict]):
+        session = self.state.active_sessions.get(session_id) or self.state.active_sessions.create(session_id)
+        session["agent_messages"] = messages
 
 
 # Global state instance
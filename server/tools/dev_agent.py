@@ -1,15 +1,66 @@
 import os
-from typing import Dict, Any, Optional
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Iterator
 from pydantic import BaseModel
 import json
+from shared import file_reader
+from shared.metrics import LatencyStats
+from ..config import config
 
 class FileOperation(BaseModel):
     path: str
     content: Optional[str] = None
 
 class DevAgent:
-    def __init__(self):
+    def __init__(self, max_workers: int = None):
         self.base_dir = os.getcwd()
+        self.max_workers = max_workers or config.get("file_io_workers", 8)
+        self._executor = None
+        self.metrics: Dict[str, LatencyStats] = {
+            "write_file": LatencyStats(),
+            "read_file": LatencyStats(),
+            "list_files": LatencyStats()
+        }
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Dedicated pool so file I/O never competes with the loop's default executor"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="kaien-file-io")
+        return self._executor
+    
+    async def _run_in_pool(self, name: str, fn: Callable, *args) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(self.executor, fn, *args)
+        except Exception:
+            self.metrics[name].record(time.perf_counter() - started, error=True)
+            raise
+        self.metrics[name].record(time.perf_counter() - started, error=not result.get("success", False))
+        return result
+    
+    async def write_file_async(self, path: str, content: str) -> Dict[str, Any]:
+        """Write a file on the file I/O pool"""
+        return await self._run_in_pool("write_file", self.write_file, path, content)
+    
+    async def read_file_async(self, path: str, offset: int = None, length: int = None,
+                              start_line: int = None, end_line: int = None) -> Dict[str, Any]:
+        """Read a file (or a byte/line range of it) on the file I/O pool"""
+        return await self._run_in_pool("read_file", self.read_file, path, offset, length, start_line, end_line)
+    
+    async def list_files_async(self, path: str = ".") -> Dict[str, Any]:
+        """List a directory on the file I/O pool"""
+        return await self._run_in_pool("list_files", self.list_files, path)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Per-operation latency for the async file tools"""
+        return {
+            "workers": self.max_workers,
+            "operations": {name: stats.snapshot() for name, stats in self.metrics.items()}
+        }
     
     def write_file(self, path: str, content: str) -> Dict[str, Any]:
         """Write content to a file"""
@@ -41,30 +92,54 @@ class DevAgent:
                 "path": path
             }
     
-    def read_file(self, path: str) -> Dict[str, Any]:
-        """Read content from a file"""
+    def check_readable(self, path: str) -> Optional[Dict[str, Any]]:
+        """Return an error result if ``path`` may not be read, else None"""
+        # Security check
+        if ".." in path or path.startswith("/"):
+            return {
+                "success": False,
+                "error": "Invalid path - directory traversal not allowed"
+            }
+        
+        if not os.path.isfile(path):
+            return {
+                "success": False,
+                "error": f"File not found: {path}"
+            }
+        return None
+    
+    def read_file(self, path: str, offset: int = None, length: int = None,
+                  start_line: int = None, end_line: int = None) -> Dict[str, Any]:
+        """Read content from a file.
+        
+        Reads a byte range (``offset``/``length``) or a 1-based line range
+        (``start_line``/``end_line``). At most ``read_file_max_bytes`` are
+        returned, whatever ``length`` asks for; ``next_offset``/``next_line``
+        and ``eof`` tell the caller how to fetch the next page.
+        """
         try:
-            # Security check
-            if ".." in path or path.startswith("/"):
-                return {
-                    "success": False,
-                    "error": "Invalid path - directory traversal not allowed"
-                }
+            error = self.check_readable(path)
+            if error:
+                return error
             
-            if not os.path.exists(path):
-                return {
-                    "success": False,
-                    "error": f"File not found: {path}"
-                }
+            max_bytes = config.get("read_file_max_bytes", 1024 * 1024)
+            mmap_threshold = config.get("read_file_mmap_threshold", file_reader.MMAP_THRESHOLD)
             
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
+            if start_line is not None or end_line is not None:
+                page = file_reader.read_lines(path, start_line or 1, end_line, max_bytes=max_bytes)
+            else:
+                page = file_reader.read_range(
+                    path,
+                    offset or 0,
+                    file_reader.clamp_length(length, max_bytes),
+                    mmap_threshold=mmap_threshold
+                )
             
             return {
                 "success": True,
                 "path": path,
-                "content": content,
-                "size": len(content)
+                **page,
+                "size": len(page["content"])
             }
         
         except Exception as e:
@@ -74,6 +149,11 @@ class DevAgent:
                 "path": path
             }
     
+    def stream_file(self, path: str, offset: int = 0, length: int = None,
+                    chunk_size: int = file_reader.DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield raw file chunks for streaming responses (validate with ``check_readable`` first)"""
+        return file_reader.iter_chunks(path, offset or 0, length, chunk_size)
+    
     def list_files(self, path: str = ".") -> Dict[str, Any]:
         """List files in a directory"""
         try:
@@ -152,5 +232,11 @@ class DevAgent:
                 "error": str(e)
             }
 
+    def shutdown(self):
+        """Stop the file I/O pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
 # Singleton instance
 dev_agent = DevAgent()
\ No newline at end of file
@@ -2,14 +2,19 @@
 
 import asyncio
 import subprocess
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator
 from pydantic import BaseModel
 import os
+import shlex
+import signal
+from shared.shell_pool import ShellPool, ShellWorkerDied
 from ..config import config
 import logging
 
 logger = logging.getLogger(__name__)
 
+STREAM_READ_SIZE = 64 * 1024
+
 
 class ShellCommand(BaseModel):
     command: str
@@ -20,11 +25,48 @@ class ShellCommand(BaseModel):
 class ShellAgent:
     def __init__(self):
         self.safe_commands = config.get("safe_commands", ["ls", "mkdir", "cd", "pwd", "echo", "cat", "grep", "find"])
+        self.persistent = config.get("shell_persistent_workers", True)
+        self.pool = ShellPool(
+            max_workers=config.get("shell_pool_size", 8),
+            max_sessions=config.get("shell_max_sessions", 32),
+            idle_timeout=config.get("shell_idle_timeout", 300)
+        )
     
-    async def execute(self, command: str, timeout: int = 60, cwd: str = None) -> Dict[str, Any]:
-        """Execute a shell command safely"""
+    async def execute(self, command: str, timeout: int = 60, cwd: str = None, session_id: str = None) -> Dict[str, Any]:
+        """Execute a shell command safely.
         
-        logger.info(f"Executing shell command: {command}")
+        With persistent workers enabled the command runs on a pooled shell
+        instead of a freshly spawned one; passing ``session_id`` pins it to
+        that session's shell so cwd and environment carry over.
+        """
+        if self.persistent:
+            return await self._execute_pooled(command, timeout=timeout, cwd=cwd, session_id=session_id)
+        
+        stdout, stderr = [], []
+        result = {"success": False, "command": command}
+        
+        async for event in self.execute_stream(command, timeout=timeout, cwd=cwd):
+            if event["type"] == "output":
+                (stdout if event["stream"] == "stdout" else stderr).append(event["data"])
+            elif event["type"] == "truncated":
+                stdout.append(event["marker"])
+            elif event["type"] == "exit":
+                result = {
+                    "success": True,
+                    "command": command,
+                    "stdout": "".join(stdout),
+                    "stderr": "".join(stderr),
+                    "returncode": event["returncode"],
+                    "truncated": event["truncated"]
+                }
+            elif event["type"] == "error":
+                result = {"success": False, "error": event["error"], "command": command}
+        
+        return result
+    
+    async def _execute_pooled(self, command: str, timeout: int = 60, cwd: str = None,
+                              session_id: str = None) -> Dict[str, Any]:
+        logger.info(f"Executing shell command on pooled worker: {command}")
         
         # Security check
         if not self._is_safe_command(command):
@@ -35,46 +77,164 @@ class ShellAgent:
                 "command": command
             }
         
+        script = f"cd {shlex.quote(cwd)} && {command}" if cwd else command
+        try:
+            output = await self.pool.run(
+                script,
+                session_id=session_id,
+                timeout=timeout,
+                max_output=config.get("shell_output_cap", 1024 * 1024)
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Command timed out: {command}")
+            return {
+                "success": False,
+                "error": "Command timed out",
+                "command": command
+            }
+        except ShellWorkerDied as e:
+            logger.warning(f"Shell worker died running {command}: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "command": command
+            }
+        except Exception as e:
+            logger.error(f"Error executing command {command}: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "command": command
+            }
+        
+        logger.info(f"Command completed: {command} (exit code: {output['returncode']})")
+        return {"success": True, "command": command, **output}
+    
+    async def close(self):
+        """Shut down pooled shell workers"""
+        await self.pool.close()
+    
+    async def execute_stream(self, command: str, timeout: int = 60, cwd: str = None,
+                             max_output: int = None) -> AsyncIterator[Dict[str, Any]]:
+        """Execute a shell command, yielding output line by line as it is produced.
+        
+        Yields ``output`` events (``stream`` is stdout or stderr), a single
+        ``truncated`` event once ``max_output`` bytes have been forwarded, and
+        finally an ``exit`` or ``error`` event. Output past the cap is still
+        drained so the process never blocks on a full pipe.
+        """
+        
+        logger.info(f"Executing shell command: {command}")
+        
+        # Security check
+        if not self._is_safe_command(command):
+            logger.warning(f"Blocked unsafe command: {command}")
+            yield {"type": "error", "error": "Command not allowed", "command": command}
+            return
+        
+        max_output = max_output or config.get("shell_output_cap", 1024 * 1024)
+        
         try:
             # Run the command
             process = await asyncio.create_subprocess_shell(
                 command,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
-                cwd=cwd or os.getcwd()
+                cwd=cwd or os.getcwd(),
+                start_new_session=True
             )
+        except Exception as e:
+            logger.error(f"Error executing command {command}: {str(e)}")
+            yield {"type": "error", "error": str(e), "command": command}
+            return
+        
+        pumps = []
+        try:
+            # Set up inside the try so the finally always reaps the process
+            queue: asyncio.Queue = asyncio.Queue()
+            pumps = [
+                asyncio.create_task(self._pump(process.stdout, "stdout", queue)),
+                asyncio.create_task(self._pump(process.stderr, "stderr", queue))
+            ]
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            forwarded = 0
+            truncated = False
+            open_streams = len(pumps)
+            
+            while open_streams:
+                try:
+                    stream, line = await asyncio.wait_for(queue.get(), timeout=max(0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    await self._kill(process)
+                    logger.warning(f"Command timed out: {command}")
+                    yield {"type": "error", "error": "Command timed out", "command": command}
+                    return
+                
+                if line is None:
+                    open_streams -= 1
+                    continue
+                if truncated:
+                    continue
+                
+                if forwarded + len(line) > max_output:
+                    line = line[:max_output - forwarded]
+                    truncated = True
+                forwarded += len(line)
+                if line:
+                    yield {"type": "output", "stream": stream, "data": line.decode(errors="replace")}
+                if truncated:
+                    yield {
+                        "type": "truncated",
+                        "limit": max_output,
+                        "marker": f"\n[output truncated after {max_output} bytes]\n"
+                    }
             
-            # Wait for completion with timeout
             try:
-                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+                returncode = await asyncio.wait_for(process.wait(), timeout=max(0, deadline - loop.time()))
             except asyncio.TimeoutError:
-                process.kill()
-                await process.wait()
-                logger.warning(f"Command timed out: {command}")
-                return {
-                    "success": False,
-                    "error": "Command timed out",
-                    "command": command
-                }
-            
-            result = {
-                "success": True,
-                "command": command,
-                "stdout": stdout.decode() if stdout else "",
-                "stderr": stderr.decode() if stderr else "",
-                "returncode": process.returncode
-            }
+                await self._kill(process)
+                yield {"type": "error", "error": "Command timed out", "command": command}
+                return
             
-            logger.info(f"Command completed: {command} (exit code: {process.returncode})")
-            return result
+            logger.info(f"Command completed: {command} (exit code: {returncode})")
+            yield {"type": "exit", "command": command, "returncode": returncode, "truncated": truncated}
         
-        except Exception as e:
-            logger.error(f"Error executing command {command}: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "command": command
-            }
+        finally:
+            for pump in pumps:
+                pump.cancel()
+            await self._kill(process)
+    
+    @staticmethod
+    async def _kill(process: asyncio.subprocess.Process):
+        """Kill the command's whole process group, so children of the shell die with it"""
+        if process.returncode is None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await process.wait()
+    
+    @staticmethod
+    async def _pump(reader: asyncio.StreamReader, name: str, queue: asyncio.Queue):
+        """Forward complete lines from a pipe; very long lines are split at the read size"""
+        buffer = b""
+        try:
+            while True:
+                chunk = await reader.read(STREAM_READ_SIZE)
+                if not chunk:
+                    break
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    await queue.put((name, line + b"\n"))
+                if len(buffer) >= STREAM_READ_SIZE:
+                    await queue.put((name, buffer))
+                    buffer = b""
+            if buffer:
+                await queue.put((name, buffer))
+        finally:
+            await queue.put((name, None))
     
     def _is_safe_command(self, command: str) -> bool:
         """Check if command is safe to execute"""
@@ -0,0 +1,297 @@
+"""Agent Loop - multi-step tool use inside a bounded context window"""
+
+import json
+import inspect
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate that needs no tokenizer; errs on the high side for English text
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PREFIX = "Summary of earlier conversation:\n"
+OMITTED_PREFIX = "[Earlier conversation omitted: "
+
+Message = Dict[str, Any]
+
+
+def estimate_tokens(messages: List[Message]) -> int:
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        text = content if isinstance(content, str) else json.dumps(content or "")
+        if message.get("tool_calls"):
+            text += json.dumps(message["tool_calls"], default=str)
+        total += len(text) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD
+    return total
+
+
+def is_observation(message: Message) -> bool:
+    """Tool output, either as a ``tool`` message or a plain-text ``Observation:`` turn"""
+    content = message.get("content")
+    return message.get("role") == "tool" or (
+        message.get("role") == "user" and isinstance(content, str) and content.startswith("Observation:"))
+
+
+class ContextBudgetError(ValueError):
+    """Raised when the pinned system prompt alone does not fit the budget"""
+
+
+def _truncate(content: str, keep: int) -> str:
+    keep = max(0, keep)
+    return f"{content[:keep]}\n... [{len(content) - keep} chars truncated]"
+
+
+class ContextBudget:
+    """Keeps a conversation inside ``max_tokens`` minus ``reserve_tokens`` for the reply.
+
+    Leading system messages are always kept. The rest is cut only at user
+    requests, so a tool result always stays with the assistant message
+    that asked for it, and tool results whose request is missing are
+    discarded. Older tool observations are cut to ``observation_chars``
+    first; then the oldest turns are replaced by a summary (``compact``)
+    or a short omission note (``fit``); if the newest turn alone is still
+    too big, its tool results and finally its longest messages are
+    truncated. ``ContextBudgetError`` is raised only when the system
+    prompt by itself is over the limit.
+    """
+
+    NOTE_TOKENS = 32
+
+    def __init__(self, max_tokens: int = 8000, reserve_tokens: int = 1000,
+                 keep_recent: int = 6, observation_chars: int = 2000):
+        self.max_tokens = max_tokens
+        self.reserve_tokens = reserve_tokens
+        self.keep_recent = keep_recent
+        self.observation_chars = observation_chars
+
+    @property
+    def limit(self) -> int:
+        return max(1, self.max_tokens - self.reserve_tokens)
+
+    @property
+    def summary_tokens(self) -> int:
+        """Room kept for the summary that ``compact`` puts in place of dropped turns"""
+        return max(self.NOTE_TOKENS, min(512, self.limit // 4))
+
+    @staticmethod
+    def _split(messages: List[Message]):
+        """Pinned system prompt(s), then everything else (earlier summaries included)"""
+        index = 0
+        while index < len(messages) and messages[index].get("role") == "system" and not str(
+                messages[index].get("content", "")).startswith((SUMMARY_PREFIX, OMITTED_PREFIX)):
+            index += 1
+        return messages[:index], messages[index:]
+
+    @staticmethod
+    def _turns(rest: List[Message]) -> List[List[Message]]:
+        """Split at each user request; tool results without a matching tool call are discarded"""
+        turns: List[List[Message]] = []
+        requested = set()
+        for message in rest:
+            if message.get("role") == "tool" and message.get("tool_call_id") not in requested:
+                logger.debug("Dropping tool result without a matching tool call")
+                continue
+            for call in message.get("tool_calls") or []:
+                requested.add(call.get("id"))
+            if not turns or (message.get("role") == "user" and not is_observation(message)):
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def _truncate_observations(self, rest: List[Message]) -> List[Message]:
+        old = max(0, len(rest) - self.keep_recent)
+        trimmed = []
+        for index, message in enumerate(rest):
+            content = message.get("content")
+            if index < old and is_observation(message) and isinstance(content, str) \
+                    and len(content) > self.observation_chars:
+                message = {**message, "content": _truncate(content, self.observation_chars)}
+            trimmed.append(message)
+        return trimmed
+
+    def _shrink(self, system: List[Message], kept: List[Message], extra: int) -> List[Message]:
+        """Truncate observations, then the longest messages, until ``kept`` fits next to ``system``"""
+        def excess_chars(messages):
+            return (estimate_tokens(system + messages) + extra - self.limit) * CHARS_PER_TOKEN
+
+        marker = 48
+        observations = [i for i, m in enumerate(kept) if is_observation(m) and isinstance(m.get("content"), str)]
+        excess = excess_chars(kept)
+        if excess > 0 and observations:
+            room = sum(len(kept[i]["content"]) for i in observations) - excess
+            cap = max(0, room // len(observations) - marker)
+            kept = [
+                {**m, "content": _truncate(m["content"], cap)}
+                if i in observations and len(m["content"]) > cap else m
+                for i, m in enumerate(kept)
+            ]
+
+        excess = excess_chars(kept)
+        while excess > 0:
+            sized = [(len(m["content"]), i) for i, m in enumerate(kept)
+                     if isinstance(m.get("content"), str) and len(m["content"]) > marker]
+            if not sized:
+                break
+            length, index = max(sized)
+            kept = list(kept)
+            kept[index] = {**kept[index], "content": _truncate(kept[index]["content"], length - excess - marker)}
+            excess = excess_chars(kept)
+        return kept
+
+    def _plan(self, messages: List[Message], note_tokens: int):
+        """(system, dropped, kept): the turns to drop and the rest, shrunk to fit"""
+        system, rest = self._split(messages)
+        if estimate_tokens(system) + note_tokens > self.limit:
+            raise ContextBudgetError(
+                f"System prompt needs ~{estimate_tokens(system)} tokens, over the {self.limit} token budget")
+        turns = self._turns(self._truncate_observations(rest))
+        cut = 0
+        while cut < len(turns) - 1 and estimate_tokens(
+                system + [m for turn in turns[cut:] for m in turn]) + (note_tokens if cut else 0) > self.limit:
+            cut += 1
+        dropped = [m for turn in turns[:cut] for m in turn]
+        kept = [m for turn in turns[cut:] for m in turn]
+        kept = self._shrink(system, kept, note_tokens if dropped else 0)
+        if estimate_tokens(system + kept) + (note_tokens if dropped else 0) > self.limit:
+            raise ContextBudgetError(f"Could not fit the conversation into {self.limit} tokens")
+        return system, dropped, kept
+
+    def over(self, messages: List[Message]) -> bool:
+        return estimate_tokens(messages) > self.limit
+
+    def fit(self, messages: List[Message]) -> List[Message]:
+        """Trim ``messages`` to the budget without calling a model"""
+        system, dropped, kept = self._plan(messages, self.NOTE_TOKENS)
+        if not dropped:
+            return system + kept
+        note = {"role": "system", "content": f"{OMITTED_PREFIX}{len(dropped)} messages]"}
+        return system + [note] + kept
+
+    async def compact(self, messages: List[Message],
+                      summarize: Callable[[List[Message]], Awaitable[str]]) -> List[Message]:
+        """Like ``fit`` but folds the dropped turns into a summary written by ``summarize``"""
+        system, dropped, kept = self._plan(messages, self.summary_tokens)
+        if not dropped:
+            return system + kept
+        try:
+            summary = await summarize(dropped)
+        except Exception as e:
+            logger.warning(f"Summarizing old turns failed, truncating instead: {str(e)}")
+            return self.fit(messages)
+        summary = summary[:self.summary_tokens * CHARS_PER_TOKEN - len(SUMMARY_PREFIX) - MESSAGE_OVERHEAD * CHARS_PER_TOKEN]
+        return system + [{"role": "system", "content": SUMMARY_PREFIX + summary}] + kept
+
+
+class AgentLoop:
+    """Think → run tools → observe, until the model answers or ``max_steps`` is hit.
+
+    ``think(messages)`` is an async generator of model events ending in a
+    ``done`` event with ``content`` and ``tool_calls`` (the shape
+    ``Brain.think_stream`` yields); ``execute(calls)`` runs a batch of
+    tool calls and returns one string per call. Histories are kept in
+    ``store`` (anything with ``get``/``set``, sync or async) per session
+    id and pass
+    through ``budget`` before every model call, so prompt size stays flat
+    however long the session runs. ``interrupt(calls, results)`` may
+    return a final answer to stop early (e.g. to ask for approval).
+    """
+
+    def __init__(self, think: Callable[[List[Message]], AsyncIterator[Dict[str, Any]]],
+                 execute: Callable[[List[Dict[str, Any]]], Awaitable[List[str]]],
+                 budget: ContextBudget = None, max_steps: int = 8, store: Any = None,
+                 summarize: Callable[[List[Message]], Awaitable[str]] = None,
+                 interrupt: Callable[[List[Dict[str, Any]], List[str]], Optional[str]] = None):
+        self.think = think
+        self.execute = execute
+        self.budget = budget or ContextBudget()
+        self.max_steps = max(1, max_steps)
+        self.store = store
+        self.summarize = summarize
+        self.interrupt = interrupt
+
+    async def history(self, session_id: Optional[str]) -> List[Message]:
+        if session_id is None or self.store is None:
+            return []
+        stored = self.store.get(session_id)
+        if inspect.isawaitable(stored):
+            stored = await stored
+        return list(stored or [])
+
+    async def _save(self, session_id: Optional[str], history: List[Message]):
+        if session_id is not None and self.store is not None:
+            saved = self.store.set(session_id, history)
+            if inspect.isawaitable(saved):
+                await saved
+
+    async def _fit(self, history: List[Message]) -> List[Message]:
+        if not self.budget.over(history):
+            return history
+        if self.summarize is not None:
+            return await self.budget.compact(history, self.summarize)
+        return self.budget.fit(history)
+
+    async def run_stream(self, user_input: str, session_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield model deltas and ``tool_result`` events tagged with their ``step``, then ``final``"""
+        history = await self.history(session_id) + [{"role": "user", "content": user_input}]
+        last_content = ""
+        for step in range(1, self.max_steps + 1):
+            history = await self._fit(history)
+            done = None
+            async for event in self.think(history):
+                if event["type"] == "done":
+                    done = event
+                else:
+                    yield {**event, "step": step}
+            content = (done or {}).get("content") or ""
+            calls = [
+                {"id": call.get("id") or f"call_{step}_{index}", "name": call["name"],
+                 "arguments": call.get("arguments") or "{}"}
+                for index, call in enumerate((done or {}).get("tool_calls") or [])
+            ]
+            last_content = content or last_content
+
+            if not calls:
+                history.append({"role": "assistant", "content": content})
+                await self._save(session_id, history)
+                yield {"type": "final", "content": content or "[No Response]", "steps": step}
+                return
+
+            results = await self.execute(calls)
+            for call, result in zip(calls, results):
+                yield {"type": "tool_result", "step": step, "id": call["id"], "name": call["name"], "result": result}
+            history.append({
+                "role": "assistant",
+                "content": content or None,
+                "tool_calls": [
+                    {"id": call["id"], "type": "function",
+                     "function": {"name": call["name"], "arguments": call["arguments"]}}
+                    for call in calls
+                ]
+            })
+            history.extend(
+                {"role": "tool", "tool_call_id": call["id"], "name": call["name"], "content": result}
+                for call, result in zip(calls, results)
+            )
+
+            answer = self.interrupt(calls, results) if self.interrupt else None
+            if answer is not None:
+                history.append({"role": "assistant", "content": answer})
+                await self._save(session_id, history)
+                yield {"type": "final", "content": answer, "steps": step}
+                return
+
+        await self._save(session_id, history)
+        logger.warning(f"Agent loop stopped after {self.max_steps} steps")
+        note = f"[Stopped after {self.max_steps} steps]"
+        yield {"type": "final", "content": f"{last_content}\n\n{note}" if last_content else note,
+               "steps": self.max_steps}
+
+    async def run(self, user_input: str, session_id: str = None) -> str:
+        final = "[No Response]"
+        async for event in self.run_stream(user_input, session_id):
+            if event["type"] == "final":
+                final = event["content"]
+        return final
@@ -0,0 +1,92 @@
+"""In-memory LRU cache with optional TTLs and hit/miss accounting"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Size-bounded LRU cache.
+
+    Entries expire after ``ttl`` seconds (or a per-entry TTL passed to
+    ``set``); ``None`` means they only leave through LRU eviction. Safe to
+    share between threads.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._expired(entry)
+
+    @staticmethod
+    def _expired(entry) -> bool:
+        _, _, expires_at = entry
+        return expires_at is not None and time.monotonic() >= expires_at
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Return ``(value, age_seconds)`` for a live entry, counting the hit or miss"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry):
+                del self._data[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            value, stored_at, _ = entry
+            return value, time.monotonic() - stored_at
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = _MISSING):
+        """Store ``value``; ``ttl`` overrides the cache default for this entry"""
+        ttl = self.ttl if ttl is _MISSING else ttl
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (value, now, now + ttl if ttl is not None else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -15,9 +15,61 @@ class Config:
     LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'http://192.168.0.111:11434')
     LLM_FAST_MODEL = os.getenv('LLM_FAST_MODEL', 'ollama/llama3.1:8b')
     LLM_SMART_MODEL = os.getenv('LLM_SMART_MODEL', 'ollama/qwen2.5-coder:32b')
+    # Prompts up to this many characters may be routed to the fast model
+    LLM_ROUTER_FAST_MAX_CHARS = int(os.getenv('LLM_ROUTER_FAST_MAX_CHARS', '1500'))
+    
+    # LLM response cache (exact SQLite tier, optional embedding-similarity tier)
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', './data/llm_cache.db')
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', '3600'))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
+    LLM_CACHE_SEMANTIC = os.getenv('LLM_CACHE_SEMANTIC', 'false').lower() == 'true'
+    LLM_CACHE_SIMILARITY = float(os.getenv('LLM_CACHE_SIMILARITY', '0.95'))
+    LLM_CACHE_SEMANTIC_CANDIDATES = int(os.getenv('LLM_CACHE_SEMANTIC_CANDIDATES', '1000'))
+    
+    # Tool calls requested in one model turn that may run at the same time
+    MAX_PARALLEL_TOOL_CALLS = int(os.getenv('MAX_PARALLEL_TOOL_CALLS', '4'))
+    
+    # Agent loop: model/tool round-trips per query and the context window budget (tokens)
+    AGENT_MAX_STEPS = int(os.getenv('AGENT_MAX_STEPS', '8'))
+    AGENT_CONTEXT_TOKENS = int(os.getenv('AGENT_CONTEXT_TOKENS', '8000'))
+    AGENT_REPLY_RESERVE = int(os.getenv('AGENT_REPLY_RESERVE', '1000'))
+    AGENT_OBSERVATION_CHARS = int(os.getenv('AGENT_OBSERVATION_CHARS', '2000'))
+    AGENT_MAX_SESSIONS = int(os.getenv('AGENT_MAX_SESSIONS', '256'))
+    AGENT_SESSION_TTL = int(os.getenv('AGENT_SESSION_TTL', '3600'))
     
     # Research configuration
     MAX_SEARCH_RESULTS = int(os.getenv('MAX_SEARCH_RESULTS', '3'))
+    # Seconds the scrape phase may take before stragglers are cancelled
+    RESEARCH_DEADLINE = float(os.getenv('RESEARCH_DEADLINE', '30'))
+    
+    # Scraper connection pool: global and per-host limits, timeouts in seconds
+    RESEARCH_MAX_CONCURRENCY = int(os.getenv('RESEARCH_MAX_CONCURRENCY', '16'))
+    RESEARCH_PER_HOST_LIMIT = int(os.getenv('RESEARCH_PER_HOST_LIMIT', '4'))
+    RESEARCH_CONNECT_TIMEOUT = float(os.getenv('RESEARCH_CONNECT_TIMEOUT', '5'))
+    RESEARCH_READ_TIMEOUT = float(os.getenv('RESEARCH_READ_TIMEOUT', '10'))
+    RESEARCH_TOTAL_TIMEOUT = float(os.getenv('RESEARCH_TOTAL_TIMEOUT', '20'))
+    
+    # On-disk cache of scraped pages; TTL applies when a response has no caching headers
+    RESEARCH_CACHE_DIR = os.getenv('RESEARCH_CACHE_DIR', './data/http_cache')
+    RESEARCH_CACHE_MAX_MB = int(os.getenv('RESEARCH_CACHE_MAX_MB', '256'))
+    RESEARCH_CACHE_TTL = int(os.getenv('RESEARCH_CACHE_TTL', '3600'))
+    
+    # HTML-to-markdown conversion runs in worker processes; bodies past the cap are cut off
+    RESEARCH_PARSE_WORKERS = int(os.getenv('RESEARCH_PARSE_WORKERS', '2'))
+    RESEARCH_MAX_HTML_BYTES = int(os.getenv('RESEARCH_MAX_HTML_BYTES', str(2 * 1024 * 1024)))
+    
+    # Memory retention (0 disables a limit); quotas look like "osint=500,research=1000"
+    MEMORY_MAX_AGE_DAYS = float(os.getenv('MEMORY_MAX_AGE_DAYS', '0'))
+    MEMORY_MAX_DOCUMENTS = int(os.getenv('MEMORY_MAX_DOCUMENTS', '0'))
+    MEMORY_SOURCE_QUOTAS = os.getenv('MEMORY_SOURCE_QUOTAS', '')
+    MEMORY_RETENTION_ACTION = os.getenv('MEMORY_RETENTION_ACTION', 'delete')
+    MEMORY_SUMMARY_QUOTA = int(os.getenv('MEMORY_SUMMARY_QUOTA', '10'))
+    MEMORY_COMPACT_INTERVAL = int(os.getenv('MEMORY_COMPACT_INTERVAL', '0'))
+    
+    # Texts longer than MEMORY_CHUNK_SIZE characters are stored as overlapping chunks
+    MEMORY_CHUNK_SIZE = int(os.getenv('MEMORY_CHUNK_SIZE', '1000'))
+    MEMORY_CHUNK_OVERLAP = int(os.getenv('MEMORY_CHUNK_OVERLAP', '150'))
     
     # Debug mode
     DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
@@ -29,4 +81,5 @@ class Config:
         print(f"LLM Fast Model: {cls.LLM_FAST_MODEL}")
         print(f"LLM Smart Model: {cls.LLM_SMART_MODEL}")
         print(f"Max Search Results: {cls.MAX_SEARCH_RESULTS}")
+        print(f"Memory Compaction Interval: {cls.MEMORY_COMPACT_INTERVAL}s")
         print(f"Debug Mode: {cls.DEBUG}")
\ No newline at end of file
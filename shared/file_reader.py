@@ -0,0 +1,161 @@
+"""Ranged and streaming file reads that never load a whole file into memory"""
+
+import mmap
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from shared.cache import LRUCache
+
+MMAP_THRESHOLD = 8 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Every LINE_INDEX_STEP-th line start is remembered, so paging never rescans from byte 0
+LINE_INDEX_STEP = 1024
+
+# (path, mtime, size) -> byte offsets of lines 1, 1 + STEP, 1 + 2 * STEP, ...
+_line_index = LRUCache(max_size=64)
+_line_index_lock = threading.Lock()
+
+
+def clamp_length(length: Optional[int], max_bytes: int) -> int:
+    """Bytes to read for a requested ``length``: at most ``max_bytes``, and never negative"""
+    if length is None:
+        return max_bytes
+    if length < 0:
+        raise ValueError("length must not be negative")
+    return min(length, max_bytes)
+
+
+def _trim_partial_utf8(data: bytes) -> bytes:
+    """Drop an incomplete multi-byte sequence at the end of a slice so the next page starts cleanly"""
+    try:
+        data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.end == len(data) and len(data) - e.start < 4:
+            return data[:e.start]
+    return data
+
+
+def read_range(path: str, offset: int = 0, length: Optional[int] = None,
+               mmap_threshold: int = MMAP_THRESHOLD) -> Dict[str, Any]:
+    """Read ``length`` bytes starting at byte ``offset``.
+
+    Files at or above ``mmap_threshold`` are sliced through a read-only
+    memory map, so only the requested pages are ever touched.
+    """
+    if (offset or 0) < 0:
+        raise ValueError("offset must not be negative")
+    size = os.path.getsize(path)
+    offset = min(offset or 0, size)
+    end = size if length is None else min(size, offset + max(0, length))
+
+    if end <= offset:
+        data = b""
+    elif size >= mmap_threshold:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = mm[offset:end]
+    else:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(end - offset)
+
+    if offset + len(data) < size:
+        data = _trim_partial_utf8(data)
+    next_offset = offset + len(data)
+
+    return {
+        "content": data.decode("utf-8", errors="replace"),
+        "offset": offset,
+        "length": len(data),
+        "file_size": size,
+        "next_offset": next_offset,
+        "eof": next_offset >= size
+    }
+
+
+def _checkpoints(path: str, stat: os.stat_result) -> List[int]:
+    key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    with _line_index_lock:
+        checkpoints = _line_index.get(key)
+        if checkpoints is None:
+            checkpoints = [0]
+            _line_index.set(key, checkpoints)
+        return checkpoints
+
+
+def read_lines(path: str, start_line: int = 1, end_line: Optional[int] = None,
+               max_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """Read the 1-based, inclusive line range ``start_line``..``end_line``.
+
+    Line boundaries are located by scanning a memory map from the nearest
+    remembered line start (see ``LINE_INDEX_STEP``), so reading page after
+    page costs about the size of each page. The slice stops early once it
+    would exceed ``max_bytes``. ``lines`` is how many lines were returned
+    and ``eof`` is true once the end of the file has been reached
+    (including when ``start_line`` is past the last line).
+    """
+    start_line = max(1, start_line or 1)
+    stat = os.stat(path)
+    size = stat.st_size
+    if size == 0:
+        return {"content": "", "start_line": start_line, "end_line": start_line - 1, "lines": 0,
+                "next_line": start_line, "next_offset": 0, "file_size": 0, "eof": True}
+
+    checkpoints = _checkpoints(path, stat)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        def advance(pos: int, line: int) -> int:
+            """Position after ``line``'s newline, remembering checkpoints on the way"""
+            newline = mm.find(b"\n", pos)
+            pos = size if newline == -1 else newline + 1
+            if line % LINE_INDEX_STEP == 0 and pos < size:
+                with _line_index_lock:
+                    if len(checkpoints) == line // LINE_INDEX_STEP:
+                        checkpoints.append(pos)
+            return pos
+
+        known = min((start_line - 1) // LINE_INDEX_STEP, len(checkpoints) - 1)
+        pos = checkpoints[known]
+        line = known * LINE_INDEX_STEP + 1
+        while line < start_line and pos < size:
+            pos = advance(pos, line)
+            line += 1
+        begin = pos
+
+        while pos < size and (end_line is None or line <= end_line):
+            line_end = advance(pos, line)
+            if max_bytes is not None and line_end - begin > max_bytes and pos > begin:
+                break
+            pos = line_end
+            line += 1
+
+        data = mm[begin:pos]
+
+    if line < start_line:
+        # Past the last line: nothing to return
+        line = start_line
+    return {
+        "content": data.decode("utf-8", errors="replace"),
+        "start_line": start_line,
+        "end_line": line - 1,
+        "lines": line - start_line,
+        "next_line": line,
+        "next_offset": pos,
+        "file_size": size,
+        "eof": pos >= size
+    }
+
+
+def iter_chunks(path: str, offset: int = 0, length: Optional[int] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the byte range ``offset``..``offset + length`` in ``chunk_size`` pieces"""
+    remaining = length
+    with open(path, "rb") as f:
+        f.seek(max(0, offset or 0))
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
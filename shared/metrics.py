@@ -0,0 +1,57 @@
+"""Lightweight latency metrics shared by the Nexus and the modules"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict
+
+
+class LatencyStats:
+    """Call count, error count and latency percentiles over a rolling window"""
+
+    def __init__(self, window: int = 512):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float, error: bool = False):
+        with self._lock:
+            self.count += 1
+            self.errors += int(error)
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._samples.append(seconds)
+
+    @contextmanager
+    def time(self):
+        """Record the duration of the ``with`` block, counting exceptions as errors"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(time.perf_counter() - started, error=True)
+            raise
+        self.record(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._samples)
+            count, errors, total, peak = self.count, self.errors, self.total, self.max
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+        return {
+            "count": count,
+            "errors": errors,
+            "avg_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(percentile(0.50), 3),
+            "p95_ms": round(percentile(0.95), 3),
+            "max_ms": round(peak * 1000, 3),
+        }
@@ -0,0 +1,289 @@
+"""Shell Pool - long-lived sandboxed shell workers reused across commands"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+
+# Only these variables are inherited by workers; everything else is dropped
+SANDBOX_ENV_KEYS = ("PATH", "HOME", "LANG", "LC_ALL", "TERM", "TZ")
+
+
+class ShellWorkerDied(RuntimeError):
+    """The worker's shell exited while a command was running (e.g. ``exit`` or a syntax error)"""
+
+
+class ShellWorker:
+    """One persistent ``/bin/sh`` process that runs commands one at a time.
+
+    Each command is written to the shell's stdin followed by a unique
+    sentinel on stdout and stderr; output is read until both sentinels
+    appear. With ``isolated`` the command runs in a subshell, so nothing
+    it changes (cwd, variables, aliases, functions, umask, ``set``
+    options) survives it; otherwise the shell keeps that state between
+    commands.
+    """
+
+    def __init__(self, cwd: str, env: Dict[str, str], shell: str = "/bin/sh"):
+        self.cwd = cwd
+        self.env = env
+        self.shell = shell
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.commands = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            self.shell,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+            env=self.env,
+            start_new_session=True
+        )
+
+    async def run(self, command: str, timeout: float = 60, max_output: int = 1024 * 1024,
+                  isolated: bool = False) -> Dict[str, Any]:
+        """Run ``command`` and return its stdout, stderr and exit status.
+
+        Raises ``asyncio.TimeoutError`` (after killing the worker) when the
+        command outlives ``timeout``.
+        """
+        if not self.alive:
+            await self.start()
+
+        marker = f"__KAIEN_DONE_{uuid.uuid4().hex}__"
+        group = f"( {command}\n)" if isolated else f"{{ {command}\n}}"
+        script = (
+            f"{group} </dev/null\n"
+            f"__kaien_rc=$?\n"
+            f"printf '\\n{marker}%s\\n' \"$__kaien_rc\"\n"
+            f"printf '\\n{marker}\\n' >&2\n"
+        )
+
+        self.last_used = time.monotonic()
+        self.commands += 1
+        self.process.stdin.write(script.encode())
+        readers = [
+            asyncio.ensure_future(self._read_until(self.process.stdout, marker.encode(), max_output)),
+            asyncio.ensure_future(self._read_until(self.process.stderr, marker.encode(), max_output))
+        ]
+        try:
+            await self.process.stdin.drain()
+            _, pending = await asyncio.wait(readers, timeout=timeout, return_when=asyncio.FIRST_EXCEPTION)
+            for reader in readers:
+                if reader.done() and reader.exception() is not None:
+                    raise reader.exception()
+            if pending:
+                raise asyncio.TimeoutError()
+            (stdout, rc, out_truncated), (stderr, _, err_truncated) = [r.result() for r in readers]
+        except (ShellWorkerDied, ConnectionError) as e:
+            self._discard(readers)
+            try:
+                returncode = await asyncio.wait_for(self.process.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                # Lost a pipe but still running; it can no longer report results
+                returncode = None
+            await self.close()
+            raise ShellWorkerDied(f"Shell worker exited with status {returncode}") from e
+        except BaseException:
+            # Timed out or cancelled mid-command: the shell's output is now out of sync
+            self._discard(readers)
+            await self.close()
+            raise
+        finally:
+            self.last_used = time.monotonic()
+
+        return {
+            "stdout": stdout.decode(errors="replace"),
+            "stderr": stderr.decode(errors="replace"),
+            "returncode": int(rc) if rc.strip().isdigit() else -1,
+            "truncated": out_truncated or err_truncated
+        }
+
+    @staticmethod
+    def _discard(readers: List[asyncio.Future]):
+        """Cancel unfinished readers and consume errors from finished ones"""
+        for reader in readers:
+            if not reader.done():
+                reader.cancel()
+            elif not reader.cancelled():
+                reader.exception()
+
+    @staticmethod
+    async def _read_until(reader: asyncio.StreamReader, marker: bytes,
+                          max_output: int) -> Tuple[bytes, bytes, bool]:
+        """Collect output up to the ``\\n<marker>`` line; return (output, text after marker, truncated)"""
+        sentinel = b"\n" + marker
+        kept = bytearray()
+        truncated = False
+        pending = b""
+
+        def keep(data: bytes):
+            nonlocal truncated
+            room = max_output - len(kept)
+            if len(data) > room:
+                truncated = True
+                data = data[:max(0, room)]
+            kept.extend(data)
+
+        while True:
+            chunk = await reader.read(READ_SIZE)
+            if not chunk:
+                raise ShellWorkerDied("Unexpected EOF from shell worker")
+            pending += chunk
+
+            index = pending.find(sentinel)
+            if index != -1:
+                newline = pending.find(b"\n", index + len(sentinel))
+                if newline == -1:
+                    continue
+                keep(pending[:index])
+                return bytes(kept), pending[index + len(sentinel):newline], truncated
+
+            # Hold back enough bytes that a sentinel split across reads is still found
+            safe = len(pending) - len(sentinel)
+            if safe > 0:
+                keep(pending[:safe])
+                pending = pending[safe:]
+
+    async def close(self):
+        if self.process is None:
+            return
+        # Kill the whole process group so children holding the pipes die too
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await self.process.wait()
+        self.process = None
+
+
+class ShellPool:
+    """Pool of persistent shell workers.
+
+    Commands with a ``session_id`` always go to that session's worker, so
+    ``cd`` and ``export`` carry over between calls. Commands without one
+    borrow any idle anonymous worker and run in a subshell, so they start
+    from the pool's ``cwd`` and environment and leave nothing behind for
+    the next caller. Workers idle for longer than ``idle_timeout`` seconds
+    are reaped in the background.
+    """
+
+    def __init__(self, cwd: str = None, max_workers: int = 8, max_sessions: int = 32,
+                 idle_timeout: float = 300, env: Dict[str, str] = None):
+        self.cwd = os.path.abspath(cwd or os.getcwd())
+        self.max_workers = max(1, max_workers)
+        self.max_sessions = max(1, max_sessions)
+        self.idle_timeout = idle_timeout
+        self.env = env if env is not None else {k: v for k, v in os.environ.items() if k in SANDBOX_ENV_KEYS}
+        self._sessions: Dict[str, ShellWorker] = {}
+        self._idle: List[ShellWorker] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._reaper: Optional[asyncio.Task] = None
+        self._spawned = 0
+        self._reaped = 0
+
+    def _ensure_started(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        if self.idle_timeout and (self._reaper is None or self._reaper.done()):
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+
+    def _new_worker(self) -> ShellWorker:
+        self._spawned += 1
+        return ShellWorker(self.cwd, self.env)
+
+    async def run(self, command: str, session_id: str = None, timeout: float = 60,
+                  max_output: int = 1024 * 1024) -> Dict[str, Any]:
+        """Run a command on a pooled worker"""
+        self._ensure_started()
+        if session_id is not None:
+            worker = await self._session_worker(session_id)
+            async with worker.lock:
+                return await worker.run(command, timeout=timeout, max_output=max_output)
+
+        async with self._slots:
+            worker = self._idle.pop() if self._idle else self._new_worker()
+            try:
+                result = await worker.run(command, timeout=timeout, max_output=max_output, isolated=True)
+            except BaseException:
+                await worker.close()
+                raise
+            self._idle.append(worker)
+            return result
+
+    async def _session_worker(self, session_id: str) -> ShellWorker:
+        worker = self._sessions.get(session_id)
+        if worker is None:
+            if len(self._sessions) >= self.max_sessions:
+                await self._evict_least_recent_session()
+            worker = self._new_worker()
+            self._sessions[session_id] = worker
+        return worker
+
+    async def _evict_least_recent_session(self):
+        idle = [(w.last_used, sid) for sid, w in self._sessions.items() if not w.lock.locked()]
+        if not idle:
+            return
+        _, session_id = min(idle)
+        await self._sessions.pop(session_id).close()
+        self._reaped += 1
+
+    async def reap_idle(self):
+        """Close workers that have not run a command within ``idle_timeout``"""
+        cutoff = time.monotonic() - self.idle_timeout
+        for session_id, worker in list(self._sessions.items()):
+            if worker.last_used < cutoff and not worker.lock.locked():
+                del self._sessions[session_id]
+                await worker.close()
+                self._reaped += 1
+        stale = [w for w in self._idle if w.last_used < cutoff]
+        self._idle = [w for w in self._idle if w.last_used >= cutoff]
+        for worker in stale:
+            await worker.close()
+            self._reaped += 1
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 2))
+            try:
+                await self.reap_idle()
+            except Exception as e:
+                logger.error(f"Shell pool reaper failed: {str(e)}")
+
+    async def close_session(self, session_id: str):
+        worker = self._sessions.pop(session_id, None)
+        if worker is not None:
+            await worker.close()
+
+    async def close(self):
+        """Stop the reaper and every worker"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for worker in list(self._sessions.values()) + self._idle:
+            await worker.close()
+        self._sessions.clear()
+        self._idle.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "idle_workers": len(self._idle),
+            "spawned": self._spawned,
+            "reaped": self._reaped
+        }
@@ -0,0 +1,187 @@
+"""Tool Registry - name-indexed tool dispatch with per-tool concurrency limits"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+class ToolNotFoundError(KeyError):
+    """Raised when dispatching a tool name that was never registered"""
+
+
+class ToolArgumentError(ValueError):
+    """Raised when tool arguments do not match the registered schema"""
+
+
+class ToolDisabledError(PermissionError):
+    """Raised when dispatching a tool registered with ``enabled=False``"""
+
+
+class ToolSpec:
+    """A registered tool: its handler, argument schema and concurrency limit"""
+
+    def __init__(self, name: str, handler: Callable, description: str = "", parameters: Dict = None,
+                 max_concurrency: int = 4, timeout: Optional[float] = None, unpack: bool = True,
+                 enabled: bool = True):
+        self.name = name
+        self.handler = handler
+        self.description = description
+        self.parameters = parameters or {}
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.unpack = unpack
+        self.enabled = enabled
+        self.is_async = asyncio.iscoroutinefunction(handler)
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.calls = 0
+        self.errors = 0
+
+    def _schema(self) -> Tuple[Dict[str, Dict], List[str]]:
+        """Normalize both JSON-schema and flat ``{"arg": {"type", "required"}}`` forms"""
+        if "properties" in self.parameters:
+            return self.parameters.get("properties", {}), list(self.parameters.get("required", []))
+        required = [name for name, spec in self.parameters.items() if isinstance(spec, dict) and spec.get("required")]
+        return self.parameters, required
+
+    def bind(self, args: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Apply defaults and check required arguments and basic JSON types"""
+        args = dict(args or {})
+        properties, required = self._schema()
+
+        missing = [name for name in required if args.get(name) is None]
+        if missing:
+            raise ToolArgumentError(f"Missing required argument(s) for '{self.name}': {', '.join(missing)}")
+
+        for name, spec in properties.items():
+            if not isinstance(spec, dict):
+                continue
+            if name not in args and "default" in spec:
+                args[name] = spec["default"]
+            expected = _JSON_TYPES.get(spec.get("type"))
+            value = args.get(name)
+            if expected is None or value is None:
+                continue
+            # bool is a subclass of int, but JSON true/false is not a number
+            if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+                raise ToolArgumentError(f"Argument '{name}' for '{self.name}' must be of type {spec['type']}")
+
+        if self.unpack and properties:
+            unknown = set(args) - set(properties)
+            if unknown:
+                logger.debug(f"Dropping unknown arguments for {self.name}: {sorted(unknown)}")
+            args = {name: value for name, value in args.items() if name in properties}
+        return args
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "errors": self.errors,
+        }
+
+
+class ToolRegistry:
+    """Maps tool names to handlers so dispatch is a single dict lookup.
+
+    Every tool gets its own semaphore, so a slow or flooded tool only queues
+    its own callers. Synchronous handlers run on ``executor`` (the loop's
+    default pool when ``None``) instead of on the event loop.
+    """
+
+    def __init__(self, default_concurrency: int = 4, executor: Optional[Executor] = None):
+        self.default_concurrency = default_concurrency
+        self.executor = executor
+        self._tools: Dict[str, ToolSpec] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def register(self, name: str, handler: Callable, description: str = "", parameters: Dict = None,
+                 max_concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                 unpack: bool = True, enabled: bool = True) -> ToolSpec:
+        """Register (or replace) a tool.
+
+        With ``unpack=True`` the handler is called with the arguments as
+        keyword arguments; otherwise it receives the argument dict.
+        """
+        spec = ToolSpec(
+            name,
+            handler,
+            description=description,
+            parameters=parameters,
+            max_concurrency=max_concurrency or self.default_concurrency,
+            timeout=timeout,
+            unpack=unpack,
+            enabled=enabled,
+        )
+        self._tools[name] = spec
+        return spec
+
+    def tool(self, name: str, **kwargs):
+        """Decorator form of :meth:`register`"""
+        def decorator(handler: Callable) -> Callable:
+            self.register(name, handler, **kwargs)
+            return handler
+        return decorator
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        return self._tools.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    async def dispatch(self, name: str, args: Optional[Dict[str, Any]] = None) -> Any:
+        """Validate ``args`` and run the tool under its concurrency limit"""
+        spec = self._tools.get(name)
+        if spec is None:
+            raise ToolNotFoundError(name)
+        if not spec.enabled:
+            raise ToolDisabledError(name)
+        bound = spec.bind(args)
+
+        spec.waiting += 1
+        try:
+            await spec.semaphore.acquire()
+        finally:
+            spec.waiting -= 1
+
+        spec.active += 1
+        spec.calls += 1
+        try:
+            call = self._call(spec, bound)
+            if spec.timeout:
+                return await asyncio.wait_for(call, timeout=spec.timeout)
+            return await call
+        except Exception:
+            spec.errors += 1
+            raise
+        finally:
+            spec.active -= 1
+            spec.semaphore.release()
+
+    async def _call(self, spec: ToolSpec, bound: Dict[str, Any]) -> Any:
+        if spec.is_async:
+            return await (spec.handler(**bound) if spec.unpack else spec.handler(bound))
+        func = functools.partial(spec.handler, **bound) if spec.unpack else functools.partial(spec.handler, bound)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: spec.stats() for name, spec in self._tools.items()}
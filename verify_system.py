@@ -170,6 +170,100 @@ def test_state():
         return False
 
 
+def test_context_budget():
+    """Test that context budgeting keeps tool-call pairs intact and stays in budget"""
+    print("Testing context budget...")
+    
+    try:
+        from shared.agent_loop import ContextBudget, estimate_tokens
+        
+        def tool_turn(call_id, result):
+            return [
+                {"role": "assistant", "content": None, "tool_calls": [
+                    {"id": call_id, "type": "function", "function": {"name": "read_file", "arguments": "{}"}}
+                ]},
+                {"role": "tool", "tool_call_id": call_id, "name": "read_file", "content": result}
+            ]
+        
+        def paired(messages):
+            requested = set()
+            for message in messages:
+                for call in message.get("tool_calls") or []:
+                    requested.add(call["id"])
+                if message["role"] == "tool" and message["tool_call_id"] not in requested:
+                    return False
+            return True
+        
+        budget = ContextBudget(max_tokens=8000, reserve_tokens=1000)
+        system = {"role": "system", "content": "You are Kaien."}
+        
+        # One oversized tool result is truncated instead of surviving as an orphan
+        history = [system, {"role": "user", "content": "read it"}] + tool_turn("a", "x" * 64 * 1024)
+        fitted = budget.fit(history)
+        assert estimate_tokens(fitted) <= budget.limit
+        assert paired(fitted)
+        assert [m["role"] for m in fitted] == ["system", "user", "assistant", "tool"]
+        
+        # Two large results: older turns go whole, never leaving a tool result behind
+        history = [system, {"role": "user", "content": "read both"}] \
+            + tool_turn("a", "y" * 20 * 1024) + tool_turn("b", "z" * 20 * 1024)
+        fitted = budget.fit(history)
+        assert estimate_tokens(fitted) <= budget.limit
+        assert paired(fitted)
+        assert fitted[-1]["role"] == "tool" and fitted[-1]["tool_call_id"] == "b"
+        
+        # Tool results without a matching request are discarded
+        fitted = budget.fit([system] + tool_turn("c", "ok")[1:] + [{"role": "user", "content": "hi"}])
+        assert [m["role"] for m in fitted] == ["system", "user"]
+        
+        print("✓ Context budget test passed")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Context budget test failed: {str(e)}")
+        return False
+
+
+def test_osint_shared_lookup():
+    """Test that cancelling one OSINT caller does not cancel others sharing the lookup"""
+    print("Testing OSINT lookup sharing...")
+    
+    try:
+        import asyncio
+        from modules.osint import OSINTModule
+        
+        class SlowOSINT(OSINTModule):
+            runs = 0
+            
+            async def _execute(self, command):
+                self.runs += 1
+                await asyncio.sleep(0.2)
+                return f"result of {command}"
+        
+        async def scenario():
+            osint = SlowOSINT()
+            first = asyncio.ensure_future(osint.lookup("whois example.com"))
+            await asyncio.sleep(0.05)
+            second = asyncio.ensure_future(osint.lookup("whois EXAMPLE.com"))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            result = await second
+            assert first.cancelled()
+            assert result["output"] == "result of whois example.com"
+            assert osint.runs == 1
+            # The finished lookup was cached even though its first caller left
+            assert (await osint.lookup("whois example.com"))["cached"]
+            await osint.close()
+        
+        asyncio.run(scenario())
+        print("✓ OSINT lookup sharing test passed")
+        return True
+        
+    except Exception as e:
+        print(f"✗ OSINT lookup sharing test failed: {str(e)}")
+        return False
+
+
 def main():
     """Run verification tests"""
     print("=" * 60)
@@ -181,7 +275,9 @@ def main():
         test_config,
         test_schemas,
         test_database,
-        test_state
+        test_state,
+        test_context_budget,
+        test_osint_shared_lookup
     ]
     
     passed = 0